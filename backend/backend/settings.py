@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import copy
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'blog_api.middleware.RequestLoggingMiddleware',  # Custom middleware
+    'blog_api.middleware.QueryInspectionMiddleware',
+    'blog_api.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -82,21 +86,158 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Route the post and auth endpoints to the async views in blog_api.async_views.
+# Enable when serving backend.asgi.application with an ASGI server.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connection handling:
+# - DB_CONN_MAX_AGE keeps a connection open per worker thread for that many
+#   seconds (0 closes it after every request), with DB_CONN_HEALTH_CHECKS
+#   pinging a reused connection before its first query in a request
+# - DB_POOL=1 uses psycopg 3's connection pool instead (pip install "psycopg[binary,pool]"),
+#   which suits ASGI, where persistent connections cannot be reused across requests
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'blog_db',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'db',
-        'PORT': '5432',
+        'NAME': os.environ.get('POSTGRES_DB', 'blog_db'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('POSTGRES_HOST', 'db'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Pooled connections are returned to the pool after each request instead
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {},
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Seconds a request waits for a free connection before failing
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+# Read replicas: POSTGRES_REPLICA_HOSTS is a comma separated list of host[:port]
+# sharing the primary's database and credentials. Views marked @replica_reads
+# read from a healthy replica (see blog_api/routers.py). Replicas need REDIS_URL:
+# the pins that keep writers reading their own writes live in the shared cache.
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[alias].update({'HOST': host, 'PORT': port or DATABASES['default']['PORT'], 'TEST': {'MIRROR': 'default'}})
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['blog_api.routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+# Replicas further behind than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+# Seconds between health and lag checks of each replica, per process
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+
+# Logging: records are queued and written to stderr by a background thread,
+# as JSON lines (LOG_FORMAT=json) or plain text (LOG_FORMAT=text), with
+# credentials redacted (see blog_api/log.py)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queue': {
+            '()': 'blog_api.log.queue_handler',
+            'format': LOG_FORMAT,
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'blog_api': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Replaces Django's own console handler, so django.request records are
+        # written once, off the request thread
+        'django': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Log N+1 patterns, duplicate and slow queries per request (development aid)
+QUERY_INSPECTION = os.environ.get('QUERY_INSPECTION', '1' if DEBUG else '0') == '1'
+# Same statement this many times in one request is reported
+QUERY_INSPECTION_REPEAT_THRESHOLD = 3
+QUERY_INSPECTION_SLOW_MS = 100
+
+# Rate limits per view scope, keyed by client 'ip' and/or authenticated 'user'.
+# Rates are "<requests>/<period>", period s, m, h or d with an optional multiplier ("100/5m").
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMITS = {
+    'login': {'ip': '10/m'},
+    'register': {'ip': '5/10m'},
+    'post_create': {'user': '30/m', 'ip': '60/m'},
+    'post_bulk': {'user': '10/m'},
+}
+# 'local' keeps buckets in each worker's memory; 'cache' shares them through the cache below
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'cache' if os.environ.get('REDIS_URL') else 'local')
+RATE_LIMIT_CACHE_ALIAS = 'default'
+# Set to e.g. 'HTTP_X_FORWARDED_FOR' only when a trusted proxy sets that header
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER') or None
+
+# Request metrics exposed at /api/metrics/ (Prometheus text format)
+# Fraction of requests whose queries are counted and timed
+METRICS_DB_SAMPLE_RATE = float(os.environ.get('METRICS_DB_SAMPLE_RATE', 0.1))
+# When set, scrapes must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set REDIS_URL to share the cache between workers
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Cached list/detail responses, invalidated by generation bumps on post writes
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300  # seconds
+
+# Post view and like counters are buffered per process and written every
+# ENGAGEMENT_FLUSH_INTERVAL seconds (0 leaves flushing to explicit calls), or
+# sooner once ENGAGEMENT_MAX_PENDING posts have buffered changes
+ENGAGEMENT_FLUSH_INTERVAL = float(os.environ.get('ENGAGEMENT_FLUSH_INTERVAL', 5))
+ENGAGEMENT_MAX_PENDING = 10000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -116,6 +257,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+PASSWORD_HASHERS = [
+    'blog_api.hashing.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Leave unset to use Django's default PBKDF2 iteration count
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)) or None
+# Upgrade stored hashes to the preferred hasher/iterations on successful login
+PASSWORD_REHASH_ON_LOGIN = os.environ.get('PASSWORD_REHASH_ON_LOGIN', '') == '1'
+
+# Password hashing runs on a bounded pool; requests beyond the queue limit get a 503
+PASSWORD_HASHING_POOL = os.environ.get('PASSWORD_HASHING_POOL', 'thread')  # 'thread' or 'process'
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 4))
+PASSWORD_HASHING_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASHING_QUEUE_LIMIT', 32))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -143,7 +302,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'blog_api.User'
 
 # Custom Authentication Backend
+# EmailOrUsernameModelBackend extends ModelBackend (permissions included), so
+# listing ModelBackend as well would only repeat the lookup after a failed login
 AUTHENTICATION_BACKENDS = [
     'blog_api.authentication.EmailOrUsernameModelBackend',
-    'django.contrib.auth.backends.ModelBackend',
-]
\ No newline at end of file
+]
+
+# JWT authentication
+# Embed id/username in access tokens so authenticated views skip the user lookup
+JWT_EMBED_USER_CLAIMS = True
+
+# In-process cache of authenticated users for tokens without embedded claims
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_TTL = 60  # seconds
+
+# Sessions revoked by logout or refresh token reuse, remembered in memory
+# for the lifetime of an access token so jwt_required rejects them without a query
+JWT_DENYLIST_SIZE = 10000
+# Seconds a session found live in the refresh token table is trusted per
+# process before jwt_required checks it again; bounds how long a logout on
+# another worker takes to reach this one
+JWT_SESSION_CHECK_INTERVAL = 5
+
+# Post listing totals: 'exact' runs COUNT(*), 'estimate' uses a cached counter, 'none' skips it
+POST_COUNT_MODE = 'estimate'
+POST_COUNT_RECONCILE_SECONDS = 300
+# Above this many rows the counter is reconciled from Postgres planner statistics
+POST_COUNT_EXACT_THRESHOLD = 100000
+POST_PAGE_SIZE_MAX = 100
+# Length of the stored summary returned by ?view=excerpt listings
+POST_EXCERPT_LENGTH = 280
+
+# POST /api/posts/bulk/ limits
+POST_BULK_MAX_OPERATIONS = 1000
+POST_BULK_BATCH_SIZE = 500
+
+# Rows fetched per round trip by the server-side cursor behind GET /api/posts/export/
+POST_EXPORT_CHUNK_SIZE = 2000
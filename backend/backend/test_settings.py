@@ -0,0 +1,19 @@
+"""
+Settings for `python manage.py test` (manage.py selects them for the test
+command unless DJANGO_SETTINGS_MODULE is set).
+"""
+
+import copy
+
+from .settings import *  # noqa: F401,F403
+
+# Tests log in, register and post far more often than the production limits
+# allow; RateLimitTestCase turns limiting back on with its own rates
+RATE_LIMIT_ENABLED = False
+
+# Post counters are only written when a test flushes them
+ENGAGEMENT_FLUSH_INTERVAL = 0
+
+# A replica for ReplicaRoutingTestCase, which lists it in `databases`; as a
+# test mirror it is a second connection to the primary's test database
+DATABASES['replica'] = {**copy.deepcopy(DATABASES['default']), 'TEST': {'MIRROR': 'default'}}  # noqa: F405
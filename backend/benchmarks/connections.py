@@ -0,0 +1,111 @@
+"""
+Compare per-request database connection handling under concurrent load:
+
+- close:      CONN_MAX_AGE=0, a new connection for every request
+- persistent: CONN_MAX_AGE=60, each worker thread keeps its connection
+- pool:       psycopg 3's connection pool (DB_POOL=1; PostgreSQL only)
+
+Requests go through the WSGI handler, so Django opens and closes connections
+exactly as it does when serving; the response cache is disabled so every
+request queries. Runs against the database configured in settings, which
+must be migrated and contain posts. Each mode runs in its own process:
+
+    python benchmarks/connections.py --requests 2000 --concurrency 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('close', 'persistent', 'pool')
+
+
+def run_mode(args):
+    if args.mode == 'pool':
+        os.environ['DB_POOL'] = '1'
+    else:
+        os.environ['DB_POOL'] = '0'
+        os.environ['DB_CONN_MAX_AGE'] = '0' if args.mode == 'close' else '60'
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+    # Settings modules that define DATABASES themselves still get the mode's behaviour
+    database = settings.DATABASES['default']
+    if args.mode == 'pool':
+        if connection.vendor != 'postgresql':
+            print(f'pool: skipped, connection pooling needs PostgreSQL (database is {connection.vendor})')
+            return
+        database.setdefault('OPTIONS', {}).setdefault('pool', {'min_size': args.concurrency, 'max_size': args.concurrency})
+        database['CONN_MAX_AGE'] = 0
+    else:
+        database.get('OPTIONS', {}).pop('pool', None)
+        database['CONN_MAX_AGE'] = 0 if args.mode == 'close' else 60
+    settings.CACHES['default'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    settings.ALLOWED_HOSTS = ['*']
+    settings.QUERY_INSPECTION = False
+
+    from blog_api.metrics import registry
+    from blog_api.models import Post
+    ids = list(Post.objects.order_by('-created_at').values_list('id', flat=True)[:100])
+    connection.close()
+    if not ids:
+        sys.exit('No posts found; seed the database first (python manage.py seed_blog)')
+
+    application = get_wsgi_application()
+
+    def request(path):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'wsgi.input': BytesIO()}
+        setup_testing_defaults(environ)
+        status = []
+        body = b''.join(application(environ, lambda code, headers: status.append(code)))
+        assert status[0].startswith('200'), status[0]
+        return body
+
+    def worker(chunk):
+        for path in chunk:
+            request(path)
+
+    paths = [f'/api/posts/{ids[i % len(ids)]}/' for i in range(args.requests)]
+    chunks = [paths[i::args.concurrency] for i in range(args.concurrency)]
+    registry.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - start
+
+    opened = sum(
+        int(line.rsplit(' ', 1)[1]) for line in registry.render().splitlines()
+        if line.startswith('db_connections_opened_total{')
+    )
+    print(f'{args.mode:<10} {len(paths)} requests in {elapsed:.2f}s ({len(paths) / elapsed:.0f} req/s, '
+          f'{elapsed / len(paths) * 1000:.2f}ms/request, {opened} connection setups, concurrency {args.concurrency})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=MODES + ('all',), default='all')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.mode != 'all':
+        run_mode(args)
+        return
+
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, '--mode', mode, '--requests', str(args.requests),
+                        '--concurrency', str(args.concurrency)], check=True)
+
+
+if __name__ == '__main__':
+    main()
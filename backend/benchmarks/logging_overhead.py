@@ -0,0 +1,112 @@
+"""
+Micro-benchmark of the logging cost of one successful login.
+
+Compares the print() calls LoginView used to make (five synchronous,
+line-buffered writes, including the raw request body) with the logging it
+does now: one lazily formatted DEBUG record and one INFO record, written
+either by a synchronous StreamHandler or through blog_api.log.queue_handler's
+background thread, and with LOG_LEVEL=WARNING, where both are dropped.
+
+Output goes to a line-buffered file (--sink file), or to a pipe drained by a
+reader slower than the writers (--sink pipe), as when a log collector falls
+behind and stdout writes block:
+
+    python benchmarks/logging_overhead.py --logins 20000 --sink pipe
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from blog_api.log import JsonFormatter, RedactingFilter, queue_handler
+
+DATA = {'username': 'benchuser', 'password': 'benchpassword123'}
+USER_ID = 42
+
+
+def print_login(logger):
+    # The sequence LoginView printed before it used logging
+    print("Login request received")
+    print(f"Login data: {DATA}")
+    print(f"User authenticated: {DATA['username']}")
+    print("Token generated")
+    print("Sending success response")
+
+
+def log_login(logger):
+    logger.debug('Login request: %s', DATA)
+    logger.info('User logged in', extra={'user_id': USER_ID})
+
+
+@contextlib.contextmanager
+def open_sink(kind):
+    if kind == 'file':
+        with tempfile.TemporaryDirectory() as directory, \
+                open(os.path.join(directory, 'out.log'), 'w', buffering=1) as stream:
+            yield stream
+        return
+
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        # About 4MB/s: 4KB reads with a millisecond pause
+        while os.read(read_fd, 4096):
+            time.sleep(0.001)
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    with open(write_fd, 'w', buffering=1) as stream:
+        yield stream
+    reader.join()
+    os.close(read_fd)
+
+
+def run(name, login, logins, stream, handler=None, level=logging.INFO):
+    logger = logging.getLogger(f'bench.{name}')
+    logger.propagate = False
+    logger.setLevel(level)
+    if handler is not None:
+        logger.addHandler(handler)
+    redirect = contextlib.redirect_stdout(stream) if handler is None else contextlib.nullcontext()
+    with redirect:
+        start = time.perf_counter()
+        for _ in range(logins):
+            login(logger)
+        elapsed = time.perf_counter() - start
+    if handler is not None:
+        logger.removeHandler(handler)
+    print(f'{name:<30} {elapsed / logins * 1e6:8.2f}us per login')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20000)
+    parser.add_argument('--sink', choices=('file', 'pipe'), default='file')
+    args = parser.parse_args()
+
+    print(f'{args.logins} logins, output to a {args.sink}')
+    with open_sink(args.sink) as stream:
+        run('print', print_login, args.logins, stream)
+
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RedactingFilter())
+        run('logging, synchronous', log_login, args.logins, stream, handler)
+
+        handler = queue_handler(stream=stream)
+        run('logging, queue', log_login, args.logins, stream, handler)
+        run('logging, queue, WARNING level', log_login, args.logins, stream, handler, logging.WARNING)
+        start = time.perf_counter()
+        handler.close()
+        print(f'{"  listener backlog":<30} {time.perf_counter() - start:8.2f}s to drain, off the request path')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of per-page JSON serialization cost for post listings.
+
+Encodes synthetic values() rows shaped like a PostListView page with
+django.http.JsonResponse and with blog_api.responses.JsonResponse (orjson
+when installed, plus the stdlib fallback it uses otherwise):
+
+    python benchmarks/serialization.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import django
+from django.conf import settings
+
+settings.configure()
+django.setup()
+
+from django.http import JsonResponse as DjangoJsonResponse
+from blog_api import responses
+
+
+def make_page(size):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        'posts': [
+            {
+                'id': i,
+                'title': f'Post title number {i}',
+                'content': 'Lorem ipsum dolor sit amet. ' * 20,
+                'author__username': f'author{i % 50}',
+                'created_at': now - datetime.timedelta(minutes=i),
+            }
+            for i in range(size)
+        ],
+        'page': 1,
+        'pages': 10,
+        'has_next': True,
+        'has_previous': False,
+        'total_posts': size * 10,
+    }
+
+
+def fallback_response(data):
+    orjson, responses.orjson = responses.orjson, None
+    try:
+        return responses.JsonResponse(data)
+    finally:
+        responses.orjson = orjson
+
+
+def main():
+    encoders = [('django JsonResponse', DjangoJsonResponse)]
+    if responses.orjson is not None:
+        encoders.append(('blog_api JsonResponse (orjson)', responses.JsonResponse))
+    encoders.append(('blog_api JsonResponse (stdlib)', fallback_response))
+
+    for size in (10, 100, 1000):
+        page = make_page(size)
+        number = max(20, 20000 // size)
+        print(f'{size} posts per page:')
+        for name, encoder in encoders:
+            seconds = min(timeit.repeat(lambda: encoder(page), number=number, repeat=5)) / number
+            print(f'  {name:<32} {seconds * 1e6:10.1f} us/page')
+
+
+if __name__ == '__main__':
+    main()
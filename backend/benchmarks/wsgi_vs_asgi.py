@@ -0,0 +1,110 @@
+"""
+Compare throughput of the sync views behind the WSGI handler with the async
+views behind the ASGI handler under concurrent load, in-process.
+
+Runs against the database configured in settings, which must be migrated
+and contain posts. Each mode runs in its own process because ASYNC_VIEWS is
+read when the URLconf is imported:
+
+    python benchmarks/wsgi_vs_asgi.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _paths(count):
+    from blog_api.models import Post
+    ids = list(Post.objects.order_by('-created_at').values_list('id', flat=True)[:100])
+    if not ids:
+        sys.exit('No posts found; seed the database first')
+    paths = []
+    for i in range(count):
+        if i % 2:
+            paths.append(f'/api/posts/{ids[i % len(ids)]}/')
+        else:
+            paths.append(f'/api/posts/?page={i % 5 + 1}')
+    return paths
+
+
+def run_wsgi(paths, concurrency):
+    from django.test import Client
+
+    def worker(chunk):
+        client = Client()
+        for path in chunk:
+            assert client.get(path).status_code == 200
+
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, chunks))
+    return time.perf_counter() - start
+
+
+def run_asgi(paths, concurrency):
+    from django.test import AsyncClient
+
+    async def worker(chunk):
+        client = AsyncClient()
+        for path in chunk:
+            response = await client.get(path)
+            assert response.status_code == 200
+
+    async def main():
+        chunks = [paths[i::concurrency] for i in range(concurrency)]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(chunk) for chunk in chunks))
+        return time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def run_mode(args):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    if args.mode == 'asgi':
+        os.environ['ASYNC_VIEWS'] = '1'
+    import django
+    django.setup()
+
+    from django.conf import settings
+    if args.no_cache:
+        settings.CACHES['default'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    settings.ALLOWED_HOSTS = ['*']
+
+    paths = _paths(args.requests)
+    runner = run_asgi if args.mode == 'asgi' else run_wsgi
+    elapsed = runner(paths, args.concurrency)
+    print(f'{args.mode}: {len(paths)} requests in {elapsed:.2f}s '
+          f'({len(paths) / elapsed:.0f} req/s, concurrency {args.concurrency})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache')
+    args = parser.parse_args()
+
+    if args.mode != 'both':
+        run_mode(args)
+        return
+
+    for mode in ('wsgi', 'asgi'):
+        command = [sys.executable, __file__, '--mode', mode,
+                   '--requests', str(args.requests), '--concurrency', str(args.concurrency)]
+        if args.no_cache:
+            command.append('--no-cache')
+        subprocess.run(command, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+ASGI-native versions of the post and auth views. They return the same
+responses as their counterparts in views.py but use the async ORM, so under
+ASGI requests are not pushed through a thread executor. Enabled by setting
+ASYNC_VIEWS in settings (see urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from .counts import get_post_count
+from .engagement import record_view
+from .hashing import HashingPoolFull
+from .models import Post
+from .queries import PostListQuery, post_payload
+from .ratelimit import ratelimit
+from .responses import JsonResponse
+from .routers import replica_reads
+from .tags import attach_tags, create_post, parse_tags
+from .response_cache import cache_response, post_detail_key, post_list_key
+from .utils import agenerate_token, arotate_refresh_token, jwt_required
+from .writes import PostWriteError, delete_post, expected_version, post_etag, update_post
+from .views import hashing_unavailable
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginView(View):
+    @method_decorator(ratelimit('login'))
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            username = data.get('username')
+            password = data.get('password')
+
+            if not username or not password:
+                return JsonResponse({'error': 'Username and password are required'}, status=400)
+
+            user = await aauthenticate(username=username, password=password)
+            if not user:
+                logger.info('Login failed', extra={'username': username})
+                return JsonResponse({'error': 'Invalid credentials'}, status=401)
+
+            logger.info('User logged in', extra={'user_id': user.id})
+
+            access_token, refresh_token = await agenerate_token(user.id, user.username)
+
+            return JsonResponse({
+                'access_token': access_token,
+                'refresh_token': refresh_token,
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name
+                }
+            }, status=200)
+        except HashingPoolFull as e:
+            return hashing_unavailable(e)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPostListView(View):
+    @method_decorator(cache_response(post_list_key))
+    @method_decorator(replica_reads)
+    async def get(self, request):
+        try:
+            listing = PostListQuery(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        count = await sync_to_async(get_post_count)(listing.count_mode)
+        rows = [row async for row in listing.page_queryset(count)]
+        if listing.with_tags:
+            await sync_to_async(attach_tags)(rows)
+        return JsonResponse(listing.payload(rows, count), safe=False)
+
+    @method_decorator(jwt_required)
+    @method_decorator(ratelimit('post_create'))
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            title = data.get('title')
+            content = data.get('content')
+
+            if not title or not content:
+                return JsonResponse({'error': 'Title and content are required'}, status=400)
+
+            tags = parse_tags(data.get('tags', []))
+            if tags:
+                post = await sync_to_async(create_post)(title, content, request.user.id, tags)
+            else:
+                post = await Post.objects.acreate(title=title, content=content, author_id=request.user.id)
+            return JsonResponse(post_payload(post, request.user.username), status=201)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPostDetailView(View):
+    @method_decorator(record_view)
+    @method_decorator(cache_response(post_detail_key))
+    @method_decorator(replica_reads)
+    async def get(self, request, post_id):
+        try:
+            post = await Post.objects.select_related('author').aget(id=post_id)
+            response = JsonResponse(post_payload(post, post.author.username))
+            response['ETag'] = post_etag(post)
+            return response
+        except Post.DoesNotExist:
+            return JsonResponse({'error': 'Post not found'}, status=404)
+
+    @method_decorator(jwt_required)
+    async def put(self, request, post_id):
+        return await self.update(request, post_id)
+
+    @method_decorator(jwt_required)
+    async def patch(self, request, post_id):
+        return await self.update(request, post_id)
+
+    async def update(self, request, post_id):
+        try:
+            data = json.loads(request.body)
+            post = await sync_to_async(update_post)(post_id, request.user.id, data, expected_version(request))
+            response = JsonResponse(post_payload(post, request.user.username))
+            response['ETag'] = post_etag(post)
+            return response
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+    @method_decorator(jwt_required)
+    async def delete(self, request, post_id):
+        try:
+            await sync_to_async(delete_post)(post_id, request.user.id, expected_version(request))
+            return JsonResponse({'message': 'Post deleted successfully'})
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncRefreshTokenView(View):
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            refresh_token = data.get('refresh_token')
+
+            if not refresh_token:
+                return JsonResponse({'error': 'Refresh token is required'}, status=400)
+
+            rotated = await arotate_refresh_token(refresh_token)
+
+            if not rotated:
+                return JsonResponse({'error': 'Invalid or expired refresh token'}, status=401)
+
+            _, access_token, new_refresh_token = rotated
+
+            return JsonResponse({
+                'access_token': access_token,
+                'refresh_token': new_refresh_token,
+            }, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
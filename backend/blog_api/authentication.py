@@ -1,25 +1,57 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
+from .hashing import hash_password, rehash_if_needed, verify_password
 
 User = get_user_model()
 
+def email_filter(email):
+    """
+    Case-insensitive email match written so that the user_email_ci_unique
+    index applies: the same LOWER(email) expression and its email <> '' condition.
+    """
+    return Q(email_lower=email.lower()) & ~Q(email='')
+
+def users_with_email(email):
+    return User.objects.alias(email_lower=Lower('email')).filter(email_filter(email))
+
 class EmailOrUsernameModelBackend(ModelBackend):
     """
     Custom authentication backend that allows users to log in with either
     their username or email address.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        if username is None:
+        if username is None or password is None:
             return None
-        
-        # Check if the input is an email address
-        try:
-            user = User.objects.get(Q(username=username) | Q(email=username))
-        except User.DoesNotExist:
+
+        # Input without an @ can only be a username: one probe of the username index.
+        # Usernames may contain @ too, so an email-shaped input probes both indexes
+        # in a single query and prefers an exact username match.
+        if '@' in username:
+            candidates = list(
+                User.objects.alias(email_lower=Lower('email'))
+                .filter(Q(username=username) | email_filter(username))[:2]
+            )
+            candidates.sort(key=lambda candidate: candidate.username != username)
+        else:
+            candidates = list(User.objects.filter(username=username))
+
+        if not candidates:
+            # Hash anyway so that unknown accounts take as long as wrong passwords
+            hash_password(password)
             return None
-        
-        if user.check_password(password):
+
+        user = candidates[0]
+        # Hash on the bounded pool rather than the request thread
+        if verify_password(password, user.password) and self.user_can_authenticate(user):
+            rehash_if_needed(user, password)
             return user
-        
-        return None
\ No newline at end of file
+
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # ModelBackend.aauthenticate only looks up usernames; share the email
+        # lookup, hashing pool, dummy hash and rehash of the sync path instead
+        return await sync_to_async(self.authenticate)(request, username=username, password=password, **kwargs)
@@ -0,0 +1,181 @@
+"""
+Batched post writes for POST /api/posts/bulk/.
+
+All operations are validated in one pass, ownership of every referenced post
+is checked with a single query, and the valid operations are applied with
+bulk_create/bulk_update/one DELETE inside a transaction, followed by the
+tags of the operations that set any. Invalid operations are reported in the
+per-item results and skipped.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .counts import author_post_count, post_count
+from .models import Post, make_excerpt
+from .response_cache import bump_generation
+from .tags import parse_tags, set_post_tags
+
+OPERATIONS = ('create', 'update', 'delete')
+UPDATABLE_FIELDS = ('title', 'content')
+# Keys each operation accepts; anything else is reported rather than ignored
+OPERATION_KEYS = {
+    'create': {'op', 'title', 'content', 'tags'},
+    'update': {'op', 'id', 'title', 'content', 'tags'},
+    'delete': {'op', 'id'},
+}
+
+
+class BulkError(ValueError):
+    pass
+
+
+def _result(index, op, status, post_id=None, error=None):
+    result = {'index': index, 'op': op, 'status': status}
+    if post_id is not None:
+        result['id'] = post_id
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+def _text(operation, name):
+    """A title/content value checked here, since a bad one would abort the whole transaction"""
+    value = operation[name]
+    if not isinstance(value, str) or not value:
+        raise BulkError(f'{name} must be a non-empty string')
+    max_length = Post._meta.get_field(name).max_length
+    if max_length is not None and len(value) > max_length:
+        raise BulkError(f'{name} must be at most {max_length} characters')
+    return value
+
+
+def _tags(operation):
+    """Parsed tags of an operation, or None when it leaves them alone"""
+    if 'tags' not in operation:
+        return None
+    try:
+        return parse_tags(operation['tags'])
+    except ValueError as e:
+        raise BulkError(str(e))
+
+
+def _validate(operation, seen_ids):
+    """Return (op, post_id, fields, tags) for a well-formed operation, or raise BulkError"""
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+        raise BulkError(f"op must be one of: {', '.join(OPERATIONS)}")
+    op = operation['op']
+    unknown = set(operation) - OPERATION_KEYS[op]
+    if unknown:
+        raise BulkError(f"Unknown fields for {op}: {', '.join(sorted(unknown))}")
+    tags = _tags(operation)
+
+    if op == 'create':
+        if not operation.get('title') or not operation.get('content'):
+            raise BulkError('Title and content are required')
+        title, content = _text(operation, 'title'), _text(operation, 'content')
+        return op, None, {'title': title, 'content': content, 'excerpt': make_excerpt(content)}, tags
+
+    post_id = operation.get('id')
+    if not isinstance(post_id, int) or isinstance(post_id, bool):
+        raise BulkError('id must be an integer')
+    if post_id in seen_ids:
+        raise BulkError('Post referenced more than once in this batch')
+    seen_ids.add(post_id)
+
+    fields = {}
+    if op == 'update':
+        fields = {name: _text(operation, name) for name in UPDATABLE_FIELDS if name in operation}
+        if not fields and tags is None:
+            raise BulkError('Nothing to update')
+        # bulk_update bypasses Post.save, so keep the stored excerpt in step here
+        if 'content' in fields:
+            fields['excerpt'] = make_excerpt(fields['content'])
+    return op, post_id, fields, tags
+
+
+def apply_post_operations(user, operations):
+    """Apply a batch of create/update/delete operations as `user` and return per-item results"""
+    if not isinstance(operations, list) or not operations:
+        raise BulkError('operations must be a non-empty list')
+    max_operations = getattr(settings, 'POST_BULK_MAX_OPERATIONS', 1000)
+    if len(operations) > max_operations:
+        raise BulkError(f'At most {max_operations} operations are allowed per request')
+
+    results = [None] * len(operations)
+    valid = []
+    seen_ids = set()
+    for index, operation in enumerate(operations):
+        try:
+            valid.append((index,) + _validate(operation, seen_ids))
+        except BulkError as e:
+            op = operation.get('op') if isinstance(operation, dict) else None
+            results[index] = _result(index, op, 400, error=str(e))
+
+    # One query for the ownership (and, for tags, the creation time) of every post the batch touches
+    owners = {
+        post_id: (author_id, created_at)
+        for post_id, author_id, created_at in Post.objects.filter(id__in=seen_ids).values_list('id', 'author_id', 'created_at')
+    }
+
+    creates, updates, deletes = [], {}, []
+    tagged = []
+    # bulk_update skips auto_now and Post.save's version bump, so both are written as columns
+    now = timezone.now()
+    for index, op, post_id, fields, tags in valid:
+        if op == 'create':
+            post = Post(author_id=user.id, **fields)
+            creates.append((index, post))
+        elif post_id not in owners:
+            results[index] = _result(index, op, 404, post_id, 'Post not found')
+            continue
+        elif owners[post_id][0] != user.id:
+            results[index] = _result(index, op, 403, post_id, 'Unauthorized')
+            continue
+        elif op == 'update':
+            # bulk_update writes the same columns for every row, so group by field set
+            post = Post(id=post_id, created_at=owners[post_id][1], updated_at=now, version=F('version') + 1, **fields)
+            updates.setdefault(tuple(sorted(fields)) + ('updated_at', 'version'), []).append((index, post))
+        else:
+            deletes.append((index, post_id))
+        if tags is not None:
+            tagged.append((post, tags, op == 'create'))
+
+    batch_size = getattr(settings, 'POST_BULK_BATCH_SIZE', 500)
+    updated_ids = [post.id for items in updates.values() for _, post in items]
+    vanished = set()
+    with transaction.atomic():
+        if creates:
+            Post.objects.bulk_create([post for _, post in creates], batch_size=batch_size)
+        updated = 0
+        for field_names, items in updates.items():
+            updated += Post.objects.bulk_update([post for _, post in items], field_names, batch_size=batch_size)
+        if updated < len(updated_ids):
+            # Some posts were deleted after the ownership query; only then look up which
+            vanished = set(updated_ids).difference(Post.objects.filter(id__in=updated_ids).values_list('id', flat=True))
+        if deletes:
+            Post.objects.filter(id__in=[post_id for _, post_id in deletes]).delete()
+        for post, tags, created in tagged:
+            if post.id not in vanished:
+                set_post_tags(post, tags, created=created)
+
+    for index, post in creates:
+        results[index] = _result(index, 'create', 201, post.id)
+    for items in updates.values():
+        for index, post in items:
+            if post.id in vanished:
+                results[index] = _result(index, 'update', 404, post.id, 'Post not found')
+            else:
+                results[index] = _result(index, 'update', 200, post.id)
+    for index, post_id in deletes:
+        results[index] = _result(index, 'delete', 200, post_id)
+
+    # bulk_create/bulk_update skip model signals, so do their bookkeeping here;
+    # the DELETE goes through the queryset and is handled by signals
+    if creates:
+        post_count.incr(len(creates))
+        author_post_count(user.id).incr(len(creates))
+    updated_ids = [post_id for post_id in updated_ids if post_id not in vanished]
+    if creates or updated_ids:
+        bump_generation('posts', *[f'post:{post_id}' for post_id in updated_ids])
+    return results
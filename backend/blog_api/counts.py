@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+def estimate_table_rows(model, using='default'):
+    """Planner row estimate from pg_class, or None if unavailable"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 for tables that have never been analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class CachedCount:
+    """
+    Row count kept in the cache and adjusted as rows are created and deleted.
+    The key expires every POST_COUNT_RECONCILE_SECONDS, after which it is
+    recomputed: exactly for small tables, from planner statistics once the
+    table is larger than POST_COUNT_EXACT_THRESHOLD rows.
+    """
+    def __init__(self, key, queryset_func):
+        self.key = key
+        self.queryset_func = queryset_func
+
+    def get(self):
+        value = cache.get(self.key)
+        if value is None:
+            value = self.reconcile()
+        return value
+
+    def reconcile(self):
+        queryset = self.queryset_func()
+        value = None
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'POST_COUNT_EXACT_THRESHOLD', 100000):
+                value = estimate
+        if value is None:
+            value = queryset.count()
+        cache.set(self.key, value, getattr(settings, 'POST_COUNT_RECONCILE_SECONDS', 300))
+        return value
+
+    def incr(self, delta=1):
+        """Adjust the count once the surrounding transaction commits; a rollback leaves it alone"""
+        using = router.db_for_write(self.queryset_func().model)
+        transaction.on_commit(lambda: self._incr(delta), using=using)
+
+    def _incr(self, delta):
+        try:
+            cache.incr(self.key, delta)
+        except ValueError:
+            # Not cached yet; the next read recomputes it
+            pass
+
+    def reset(self):
+        cache.delete(self.key)
+
+
+def _all_posts():
+    from .models import Post
+    return Post.objects.all()
+
+
+post_count = CachedCount('counts:posts', _all_posts)
+
+
+def author_post_count(author_id):
+    """Cached number of posts by one author"""
+    from .models import Post
+    return CachedCount(f'counts:author:{author_id}', lambda: Post.objects.filter(author_id=author_id))
+
+
+def tag_post_count(tag_id):
+    """Cached number of posts with one tag"""
+    from .models import PostTag
+    return CachedCount(f'counts:tag:{tag_id}', lambda: PostTag.objects.filter(tag_id=tag_id))
+
+
+def get_post_count(mode):
+    """Total number of posts for the given count mode, or None for 'none'"""
+    if mode == 'exact':
+        return _all_posts().count()
+    if mode == 'estimate':
+        return post_count.get()
+    return None
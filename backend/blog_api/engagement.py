@@ -0,0 +1,187 @@
+"""
+Post view counts and likes.
+
+Counting a view must not cost its request a write, so views (and the
+like_count changes that follow likes) are added up in memory per process
+and written in batches: one UPDATE ... SET view_count = view_count + %s
+WHERE id IN (...) per distinct delta, every ENGAGEMENT_FLUSH_INTERVAL seconds,
+from a background thread. Deltas are additive, so each worker flushing its own
+is as correct as sharing them, without a cache round trip per view.
+
+Counts therefore trail reality by up to one interval (and by whatever a
+worker had buffered when it was killed without a clean exit). The post_likes
+table, with one row per (user, post), is the source of truth for likes.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Post, PostLike
+from .response_cache import bump_generation
+from .writes import PostNotFound
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('view_count', 'like_count')
+# Ids per UPDATE, well under the bound parameter limits of every backend
+FLUSH_BATCH_SIZE = 500
+
+
+class CounterBuffer:
+    """Per-process deltas of the denormalized Post counters, flushed in batches"""
+    def __init__(self):
+        self._deltas = Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._wake = threading.Event()
+
+    def add(self, field, post_id, delta=1):
+        with self._lock:
+            self._deltas[field, post_id] += delta
+            pending = len(self._deltas)
+        if self._flusher is None:
+            self._start_flusher()
+        if pending >= getattr(settings, 'ENGAGEMENT_MAX_PENDING', 10000):
+            # Flush early rather than let a burst of distinct posts grow the buffer
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._deltas)
+
+    def flush(self):
+        """Write the buffered deltas; returns the number of rows updated"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+        groups = defaultdict(list)
+        for (field, post_id), delta in deltas.items():
+            if delta:
+                groups[field, delta].append(post_id)
+        if not groups:
+            return 0
+
+        using = router.db_for_write(Post)
+        updated = 0
+        try:
+            with transaction.atomic(using=using):
+                for (field, delta), post_ids in groups.items():
+                    value = F(field) + Value(delta)
+                    if delta < 0:
+                        # Never below zero, even if increments were lost with a worker
+                        value = Greatest(value, Value(0))
+                    for start in range(0, len(post_ids), FLUSH_BATCH_SIZE):
+                        batch = post_ids[start:start + FLUSH_BATCH_SIZE]
+                        updated += Post.objects.using(using).filter(id__in=batch).update(**{field: value})
+        except DatabaseError as e:
+            # Keep the deltas for the next flush
+            with self._lock:
+                self._deltas.update(deltas)
+            logger.warning('Flushing %d post counters failed: %s', len(deltas), e)
+            return 0
+
+        liked = {post_id for field, post_id in deltas if field == 'like_count'}
+        if liked:
+            # Views alone do not invalidate cached responses; a hot post would never stay cached
+            bump_generation(*(f'post:{post_id}' for post_id in liked))
+        return updated
+
+    def clear(self):
+        with self._lock:
+            self._deltas.clear()
+
+    def _start_flusher(self):
+        interval = getattr(settings, 'ENGAGEMENT_FLUSH_INTERVAL', 5)
+        if interval <= 0:
+            # Flushing is left to explicit flush() calls
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, args=(interval,), name='engagement-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Post counter flush failed')
+            finally:
+                # The thread's own connection, kept or closed per CONN_MAX_AGE
+                close_old_connections()
+
+
+counters = CounterBuffer()
+
+
+def _counts_view(response):
+    return response.status_code in (200, 304)
+
+
+def record_view(view_func):
+    """Count a view of post_id for every successful (or not modified) GET of a sync or async view"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, post_id, *args, **kwargs):
+            response = await view_func(request, post_id, *args, **kwargs)
+            if _counts_view(response):
+                counters.add('view_count', post_id)
+            return response
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view_func(request, post_id, *args, **kwargs)
+        if _counts_view(response):
+            counters.add('view_count', post_id)
+        return response
+
+    return wrapper
+
+
+def like_post(post_id, user_id):
+    """
+    Record that user_id likes post_id: one INSERT ... SELECT that also checks
+    the post exists. Returns False when the user already liked it; raises
+    PostNotFound.
+    """
+    using = router.db_for_write(PostLike)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    created_at = PostLike._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+    sql = (
+        f"INSERT INTO {quote(PostLike._meta.db_table)} (user_id, post_id, created_at) "
+        f"SELECT %s, id, %s FROM {quote(Post._meta.db_table)} WHERE id = %s "
+        f"ON CONFLICT DO NOTHING"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, created_at, post_id])
+        inserted = cursor.rowcount
+    if not inserted:
+        if not Post.objects.using(using).filter(id=post_id).exists():
+            raise PostNotFound()
+        return False
+    counters.add('like_count', post_id, 1)
+    return True
+
+
+def unlike_post(post_id, user_id):
+    """Remove user_id's like of post_id. Returns False when there was none; raises PostNotFound."""
+    deleted, _ = PostLike.objects.filter(user_id=user_id, post_id=post_id).delete()
+    if not deleted:
+        if not Post.objects.using(router.db_for_write(Post)).filter(id=post_id).exists():
+            raise PostNotFound()
+        return False
+    counters.add('like_count', post_id, -1)
+    return True
@@ -0,0 +1,48 @@
+"""
+Streaming NDJSON export of posts for GET /api/posts/export/.
+
+Rows are read through a server-side cursor (QuerySet.iterator) and encoded
+one line at a time with responses.dumps, optionally through a streaming gzip
+compressor, so memory use stays flat however many posts are exported.
+"""
+import zlib
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .models import Post
+from .queries import POST_LIST_FIELDS
+from .responses import dumps
+
+
+def export_queryset(author=None, since=None, until=None):
+    """Posts to export, oldest first; since/until are ISO 8601 datetimes. Raises ValueError."""
+    posts = Post.objects.all()
+    if author:
+        posts = posts.filter(author__username=author)
+    for name, value, lookup in (('since', since, 'created_at__gte'), ('until', until, 'created_at__lt')):
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(f'{name} must be an ISO 8601 datetime')
+            posts = posts.filter(**{lookup: parsed})
+    return posts.values(*POST_LIST_FIELDS).order_by('created_at', 'id')
+
+
+def ndjson_lines(queryset):
+    chunk_size = getattr(settings, 'POST_EXPORT_CHUNK_SIZE', 2000)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dumps(row) + b'\n'
+
+
+def gzip_stream(chunks, flush_every=64 * 1024):
+    """Gzip a byte stream incrementally, emitting compressed output as it fills"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_every:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
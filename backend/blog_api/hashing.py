@@ -0,0 +1,109 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 pins a CPU for tens of milliseconds per hash. Running it on a bounded
+pool caps how many hashes run at once, and rejecting work once the pool's
+queue is full (HashingPoolFull, surfaced as 503) keeps a login burst from
+tying up every request worker.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, get_hasher, identify_hasher, make_password,
+)
+
+
+class HashingPoolFull(Exception):
+    pass
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the iteration count taken from PASSWORD_PBKDF2_ITERATIONS.
+    It keeps the pbkdf2_sha256 algorithm name, so existing hashes still verify
+    and are upgraded on login when PASSWORD_REHASH_ON_LOGIN is enabled.
+    """
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+
+def _init_worker():
+    # Worker processes started with spawn need Django configured to load hashers
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+
+class HashingPool:
+    def __init__(self, kind='thread', workers=4, queue_limit=32):
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == 'process':
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hashing')
+        return self._executor
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on the pool, raising HashingPoolFull if the queue is at its limit"""
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolFull('Too many password hashing requests in progress')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+
+hashing_pool = HashingPool(
+    kind=getattr(settings, 'PASSWORD_HASHING_POOL', 'thread'),
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 4),
+    queue_limit=getattr(settings, 'PASSWORD_HASHING_QUEUE_LIMIT', 32),
+)
+
+
+def hash_password(password):
+    """make_password on the hashing pool"""
+    return hashing_pool.run(make_password, password)
+
+
+def verify_password(password, encoded):
+    """check_password on the hashing pool"""
+    return hashing_pool.run(check_password, password, encoded)
+
+
+def needs_rehash(encoded):
+    """Whether a stored hash uses a different hasher or cost than the preferred one"""
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def rehash_if_needed(user, password):
+    """Upgrade the user's stored hash after a successful login, if enabled"""
+    if not getattr(settings, 'PASSWORD_REHASH_ON_LOGIN', False) or not needs_rehash(user.password):
+        return
+    try:
+        user.password = hash_password(password)
+    except HashingPoolFull:
+        # The login already succeeded; upgrade on a quieter login instead
+        return
+    type(user).objects.filter(pk=user.pk).update(password=user.password)
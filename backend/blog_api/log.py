@@ -0,0 +1,121 @@
+"""
+Structured, non-blocking logging.
+
+queue_handler() is the handler factory used by settings.LOGGING. Request
+threads only put records on an in-memory queue; a QueueListener thread
+formats them (JSON lines by default) and writes them to stderr, so a slow
+terminal or log collector never stalls a request.
+
+Records are redacted before they are queued: values of credential-like keys
+in dict arguments and `extra` fields are replaced, as are bearer tokens and
+JWTs that appear in the merged message.
+"""
+import datetime
+import json
+import logging
+import queue
+import re
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[redacted]'
+SENSITIVE_KEYS = frozenset({
+    'password', 'password1', 'password2', 'new_password', 'old_password',
+    'token', 'access_token', 'refresh_token', 'authorization', 'secret', 'api_key',
+})
+# Bearer credentials and anything shaped like a JWT
+_TOKEN_RE = re.compile(r'(?i)bearer\s+\S+|\beyJ[\w-]+\.[\w-]+\.[\w-]+')
+
+_traceback_formatter = logging.Formatter()
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact(value):
+    """Copy of value with credential-like entries of (nested) dicts masked"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and key.lower() in SENSITIVE_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+def _extra(record):
+    attrs = vars(record)
+    return {key: attrs[key] for key in attrs.keys() - _RECORD_ATTRS}
+
+
+class RedactingFilter(logging.Filter):
+    def filter(self, record):
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        for key, value in _extra(record).items():
+            setattr(record, key, REDACTED if key.lower() in SENSITIVE_KEYS else redact(value))
+        return True
+
+
+class RedactingQueueHandler(QueueHandler):
+    listener = None
+
+    def close(self):
+        # Called by logging.shutdown() at exit: write out whatever is still queued
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+    def prepare(self, record):
+        # Merge the arguments now, while they still hold their current values, and
+        # render any traceback to text; formatting is left to the listener thread.
+        # Unlike QueueHandler.prepare this does not copy the record, which is
+        # fine while this is the only handler of the loggers it serves.
+        record.message = record.msg = _TOKEN_RE.sub(REDACTED, record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields"""
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_extra(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def queue_handler(format='json', stream=None):
+    """
+    Handler for settings.LOGGING that queues records for a background
+    QueueListener writing to stream (stderr) in the given format, 'json' or 'text'.
+    """
+    target = logging.StreamHandler(stream or sys.stderr)
+    if format == 'json':
+        target.setFormatter(JsonFormatter())
+    else:
+        target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, target, respect_handler_level=True)
+    listener.start()
+
+    handler = RedactingQueueHandler(records)
+    handler.addFilter(RedactingFilter())
+    handler.listener = listener
+    return handler
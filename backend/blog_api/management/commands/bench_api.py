@@ -0,0 +1,296 @@
+"""
+Load test the API and write latency percentiles and throughput to JSON.
+
+Seeds benchmark users and posts into the configured database, starts a
+threaded WSGI server on a free local port (or targets --url) and runs each
+scenario with --concurrency client threads:
+
+    python manage.py bench_api --users 20 --posts 2000 --requests 1000 --concurrency 20 --output bench.json
+
+The JSON report is written with sorted keys so runs on two commits can be
+diffed directly. Against the built-in server the client threads share the
+GIL with the server; use --url with a separately started server (and the
+same database) for numbers closer to a deployment. Such a server should run
+with RATE_LIMIT_ENABLED=0, or the login and create scenarios measure 429s.
+"""
+import http.client
+import json
+import math
+import socket
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from blog_api.models import Post
+from blog_api.seeding import seed_posts, seed_users
+
+SCENARIOS = ('login', 'refresh', 'list', 'detail', 'create', 'update')
+USERNAME_PREFIX = 'bench'
+
+
+class BenchRequestHandler(WSGIRequestHandler):
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, Nagle's
+        # algorithm and delayed ACKs add ~40ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Client:
+    """Keep-alive HTTP connection for one worker thread, reconnecting when the server closes it"""
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.connection = None
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body).encode() if body is not None else None
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, self.prefix + path, payload, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Worker:
+    """A logged in benchmark user with its own connection and tokens"""
+    def __init__(self, base_url, username, password):
+        self.client = Client(base_url)
+        self.username = username
+        self.password = password
+        self.access_token = None
+        self.refresh_token = None
+        self.own_post_ids = []
+
+    def login(self):
+        status, data = self.client.request('POST', '/login/', {'username': self.username, 'password': self.password})
+        if status == 200:
+            tokens = json.loads(data)
+            self.access_token = tokens['access_token']
+            self.refresh_token = tokens['refresh_token']
+        return status
+
+    def prepare(self):
+        if self.login() != 200:
+            raise CommandError(f'Could not log in as {self.username}')
+        status, data = self.client.request('GET', f'/users/{self.username}/posts/?fields=id&page_size=100')
+        if status == 200:
+            self.own_post_ids = [post['id'] for post in json.loads(data)['posts']]
+
+    def refresh(self):
+        status, data = self.client.request('POST', '/auth/refresh-token/', {'refresh_token': self.refresh_token})
+        if status == 200:
+            tokens = json.loads(data)
+            self.access_token = tokens['access_token']
+            # Keep the newest refresh token in case the server rotates them
+            self.refresh_token = tokens.get('refresh_token', self.refresh_token)
+        return status
+
+    def run(self, scenario, index, post_ids):
+        if scenario == 'login':
+            return self.login()
+        if scenario == 'refresh':
+            return self.refresh()
+        if scenario == 'list':
+            return self.client.request('GET', f'/posts/?page={index % 5 + 1}')[0]
+        if scenario == 'detail':
+            return self.client.request('GET', f'/posts/{post_ids[index % len(post_ids)]}/')[0]
+        if scenario == 'create':
+            body = {'title': f'Benchmark post {index}', 'content': 'Created by bench_api. ' * 20}
+            return self.client.request('POST', '/posts/', body, self.access_token)[0]
+        if scenario == 'update':
+            post_id = self.own_post_ids[index % len(self.own_post_ids)]
+            body = {'title': f'Benchmark update {index}'}
+            return self.client.request('PUT', f'/posts/{post_id}/', body, self.access_token)[0]
+        raise CommandError(f'Unknown scenario {scenario}')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(count for code, count in statuses.items() if code >= 400),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Seed benchmark data, load test the API and report latency percentiles and throughput as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Benchmark users to seed')
+        parser.add_argument('--posts', type=int, default=1000, help='Benchmark posts to seed')
+        parser.add_argument('--password', default='bench-password-123', help='Password of the benchmark users')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+        parser.add_argument('--warmup', type=int, default=20, help='Unrecorded requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma separated subset of: {', '.join(SCENARIOS)}")
+        parser.add_argument('--url', help='Benchmark a running server, e.g. http://127.0.0.1:8000/api')
+        parser.add_argument('--no-seed', action='store_true', help='Use the benchmark data already in the database')
+        parser.add_argument('--output', default='bench.json', help='Where to write the JSON report')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios).difference(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options['users'] < 1 or options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--users, --concurrency and --requests must be positive')
+
+        if not options['no_seed']:
+            self.seed(options['users'], options['posts'], options['password'])
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server, base_url = self.start_server()
+        try:
+            report = self.run_scenarios(base_url, scenarios, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+        for name, result in report['scenarios'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<8} {result['throughput_rps']:>8.1f} req/s  p50 {latency['p50']:>8.2f}ms  "
+                f"p95 {latency['p95']:>8.2f}ms  p99 {latency['p99']:>8.2f}ms  errors {result['errors']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def seed(self, users, posts, password):
+        """Create missing benchmark users and top up their posts to the requested count"""
+        author_ids = seed_users(users, USERNAME_PREFIX, password)
+        existing = Post.objects.filter(author_id__in=author_ids).count()
+        if posts > existing:
+            # Spread evenly so every worker's user has posts to update
+            seed_posts(author_ids, posts - existing, seed=existing, skewed=False)
+        self.stdout.write(f'Seeded {len(author_ids)} users and {max(posts, existing)} posts')
+
+    def start_server(self):
+        # Per-query stack inspection is a development aid that would dominate the timings
+        settings.QUERY_INSPECTION = False
+        # The benchmark logs in and creates posts far faster than the production limits allow
+        settings.RATE_LIMIT_ENABLED = False
+        server = ThreadedWSGIServer(('127.0.0.1', 0), BenchRequestHandler)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        # The server threads open their own connections; release this one
+        connection.close()
+        host, port = server.server_address[:2]
+        return server, f'http://{host}:{port}/api'
+
+    def run_scenarios(self, base_url, scenarios, options):
+        concurrency = options['concurrency']
+        workers = [
+            Worker(base_url, f'{USERNAME_PREFIX}{i % options["users"]}', options['password'])
+            for i in range(concurrency)
+        ]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(Worker.prepare, workers))
+            status, data = workers[0].client.request('GET', '/posts/?fields=id&page_size=100')
+            post_ids = [post['id'] for post in json.loads(data)['posts']] if status == 200 else []
+            if not post_ids and {'detail', 'update'}.intersection(scenarios):
+                raise CommandError('No posts to read or update; seed the database first')
+            if 'update' in scenarios and not all(worker.own_post_ids for worker in workers):
+                raise CommandError('Every benchmark user needs a post to update; seed at least --users posts')
+
+            results = {}
+            for scenario in scenarios:
+                self.run_batch(pool, workers, scenario, options['warmup'], post_ids)
+                latencies, statuses, elapsed = self.run_batch(pool, workers, scenario, options['requests'], post_ids)
+                results[scenario] = summarize(latencies, statuses, elapsed)
+
+        for worker in workers:
+            worker.client.close()
+        return {
+            'commit': git_revision(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'target': options['url'] or 'local',
+            'concurrency': concurrency,
+            'requests_per_scenario': options['requests'],
+            'seed': {'users': options['users'], 'posts': options['posts']},
+            'scenarios': results,
+        }
+
+    def run_batch(self, pool, workers, scenario, count, post_ids):
+        """Run count requests of one scenario spread over the workers"""
+        if count <= 0:
+            return [], Counter(), 0
+
+        def work(position):
+            worker = workers[position]
+            latencies, statuses = [], Counter()
+            for index in range(position, count, len(workers)):
+                start = time.perf_counter()
+                try:
+                    status = worker.run(scenario, index, post_ids)
+                except (OSError, http.client.HTTPException):
+                    status = 599
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[status] += 1
+            return latencies, statuses
+
+        start = time.perf_counter()
+        latencies, statuses = [], Counter()
+        for worker_latencies, worker_statuses in pool.map(work, range(len(workers))):
+            latencies.extend(worker_latencies)
+            statuses.update(worker_statuses)
+        return latencies, statuses, time.perf_counter() - start
@@ -0,0 +1,34 @@
+"""
+Delete expired refresh token rows:
+
+    python manage.py prune_refresh_tokens
+
+Rows are kept until they expire even once revoked or rotated, since reuse
+detection needs them. Deletes run in batches to keep each transaction short;
+schedule the command (e.g. daily from cron).
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from blog_api.models import RefreshToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be deleted')
+
+    def handle(self, *args, **options):
+        expired = RefreshToken.objects.filter(expires_at__lte=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} expired refresh tokens')
+            return
+
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += RefreshToken.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired refresh tokens'))
@@ -0,0 +1,163 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Every request records its latency and response size per route (the resolved
+URL name, so /api/posts/1/ and /api/posts/2/ share one series). Query count
+and database time are only collected for a sample of requests, controlled by
+METRICS_DB_SAMPLE_RATE, because timing each query wraps the cursor.
+"""
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class MetricsRegistry:
+    HISTOGRAMS = {
+        'http_request_duration_ms': ('Request latency in milliseconds', LATENCY_BUCKETS_MS),
+        'http_response_size_bytes': ('Response body size in bytes', SIZE_BUCKETS_BYTES),
+        'db_queries_per_request': ('Database queries per request (sampled)', QUERY_BUCKETS),
+        'db_time_per_request_ms': ('Database time per request in milliseconds (sampled)', LATENCY_BUCKETS_MS),
+    }
+
+    COUNTERS = {
+        'db_connections_opened_total': 'Database connections set up by Django (pool checkouts when pooled)',
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {name: {} for name in self.HISTOGRAMS}
+        self._counters = {name: {} for name in self.COUNTERS}
+        self._collectors = {}
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            series = self._series[name]
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self.HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def inc(self, name, labels='', amount=1):
+        with self._lock:
+            series = self._counters[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe_request(self, route, method, status, duration_ms, size=None, queries=None, db_ms=None):
+        labels = f'route="{route}",method="{method}",status="{status}"'
+        self.observe('http_request_duration_ms', labels, duration_ms)
+        if size is not None:
+            self.observe('http_response_size_bytes', labels, size)
+        if queries is not None:
+            route_labels = f'route="{route}",method="{method}"'
+            self.observe('db_queries_per_request', route_labels, queries)
+            self.observe('db_time_per_request_ms', route_labels, db_ms)
+
+    def register_collector(self, name, metric_type, help_text, collect):
+        """Expose values from collect() -> {labels: value} as a gauge or counter on every scrape"""
+        self._collectors[name] = (metric_type, help_text, collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in sorted(self._series[name].items()):
+                    lines.extend(histogram.samples(name, labels))
+            for name, help_text in self.COUNTERS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+        for name, (metric_type, help_text, collect) in self._collectors.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in collect().items():
+                lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._series = {name: {} for name in self.HISTOGRAMS}
+            self._counters = {name: {} for name in self.COUNTERS}
+
+
+registry = MetricsRegistry()
+
+
+def _user_cache_stats():
+    from .user_cache import user_cache
+    stats = user_cache.stats()
+    return {f'result="{key}"': value for key, value in stats.items() if key in ('hits', 'misses')}
+
+
+registry.register_collector('jwt_user_cache_lookups_total', 'counter', 'JWT user cache lookups by result', _user_cache_stats)
+
+
+def _pending_post_counters():
+    from .engagement import counters
+    return {'': counters.pending()}
+
+
+registry.register_collector(
+    'post_counters_pending', 'gauge', 'Post view/like counter changes buffered for the next flush', _pending_post_counters,
+)
+
+
+def _pooled_connections():
+    from django.conf import settings
+    from django.db import connections
+    for alias, config in settings.DATABASES.items():
+        if config.get('OPTIONS', {}).get('pool'):
+            yield alias, connections[alias]
+
+
+def _pool_stat(collect):
+    """Collector reading psycopg_pool statistics of every pooled database"""
+    def collector():
+        values = {}
+        for alias, connection in _pooled_connections():
+            values[f'database="{alias}"'] = collect(connection.pool.get_stats())
+        return values
+    return collector
+
+
+# psycopg_pool keeps cumulative request counters; waits are in milliseconds
+registry.register_collector('db_pool_size', 'gauge', 'Connections open in the pool',
+                            _pool_stat(lambda stats: stats.get('pool_size', 0)))
+registry.register_collector('db_pool_in_use', 'gauge', 'Pooled connections checked out',
+                            _pool_stat(lambda stats: stats.get('pool_size', 0) - stats.get('pool_available', 0)))
+registry.register_collector('db_pool_waiting', 'gauge', 'Requests waiting for a pooled connection',
+                            _pool_stat(lambda stats: stats.get('requests_waiting', 0)))
+registry.register_collector('db_pool_checkouts_total', 'counter', 'Connections requested from the pool',
+                            _pool_stat(lambda stats: stats.get('requests_num', 0)))
+registry.register_collector('db_pool_checkout_wait_ms_total', 'counter', 'Time spent waiting for a pooled connection',
+                            _pool_stat(lambda stats: stats.get('requests_wait_ms', 0)))
+registry.register_collector('db_pool_connections_opened_total', 'counter', 'Connections the pool opened to the server',
+                            _pool_stat(lambda stats: stats.get('connections_num', 0)))
+registry.register_collector('db_pool_timeouts_total', 'counter', 'Requests that gave up waiting for a connection',
+                            _pool_stat(lambda stats: stats.get('requests_errors', 0)))
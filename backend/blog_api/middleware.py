@@ -1,23 +1,160 @@
 import time
+import random
 import logging
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .metrics import registry
+from .query_inspection import QueryInspector
+from .routers import check_pin_cache, pin_to_primary, replica_aliases
 
 logger = logging.getLogger(__name__)
 
+class QueryTimer:
+    """Database execute wrapper counting queries and the time spent in them"""
+    def __init__(self):
+        self.queries = 0
+        self.elapsed_ns = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed_ns += time.perf_counter_ns() - start
+            self.queries += 1
+
 class RequestLoggingMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.db_sample_rate = getattr(settings, 'METRICS_DB_SAMPLE_RATE', 0.1)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Record the start time
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         
-        # Process the request
-        response = self.get_response(request)
+        # Process the request, timing its queries for a sample of requests
+        timer = None
+        if self.db_sample_rate and random.random() < self.db_sample_rate:
+            timer = QueryTimer()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
         
+        self.record(request, response, start_time, timer)
+        return response
+
+    async def __acall__(self, request):
+        # Queries of async views run on executor threads with their own
+        # connections, so only latency and size are recorded here
+        start_time = time.perf_counter_ns()
+        response = await self.get_response(request)
+        self.record(request, response, start_time, None)
+        return response
+
+    def record(self, request, response, start_time, timer):
         # Calculate the time taken
-        duration = (time.time() - start_time) * 1000  # Convert to milliseconds
+        duration = (time.perf_counter_ns() - start_time) / 1e6  # Convert to milliseconds
+        
+        # Per-route metrics use the resolved URL name rather than the raw path
+        match = request.resolver_match
+        route = match.view_name if match else '<unmatched>'
+        registry.observe_request(
+            route,
+            request.method,
+            response.status_code,
+            duration,
+            size=None if response.streaming else len(response.content),
+            queries=timer.queries if timer else None,
+            db_ms=timer.elapsed_ns / 1e6 if timer else None,
+        )
         
         # Log the request details
-        logger.info(f"{request.method} {request.path} - {duration:.2f}ms")
+        logger.info('%s %s - %.2fms', request.method, request.path, duration)
+
+class QueryInspectionMiddleware:
+    """
+    Development aid logging N+1 patterns, duplicate queries and slow queries
+    with the project line that issued them. Enabled by QUERY_INSPECTION,
+    which defaults to DEBUG.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # Async views query from executor threads, out of reach of a wrapper
+        # installed here, so inspection only covers the sync stack
+        if not getattr(settings, 'QUERY_INSPECTION', False) or iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'QUERY_INSPECTION_REPEAT_THRESHOLD', 3)
+        self.slow_ms = getattr(settings, 'QUERY_INSPECTION_SLOW_MS', 100)
+
+    def __call__(self, request):
+        inspector = QueryInspector()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(inspector))
+            response = self.get_response(request)
+        
+        for sql, count, origins, duplicate in inspector.repeated(self.repeat_threshold):
+            kind = 'Duplicate query' if duplicate else 'Possible N+1'
+            logger.warning('%s on %s %s: ran %d times from %s: %s',
+                           kind, request.method, request.path, count, ', '.join(origins), sql)
+        for sql, duration, origin in inspector.slow(self.slow_ms):
+            logger.warning('Slow query on %s %s: %.2fms from %s: %s',
+                           request.method, request.path, duration, origin, sql)
         
-        return response
\ No newline at end of file
+        return response
+
+class ReplicaPinMiddleware:
+    """
+    Pin a user's reads to the primary after each of their successful writes,
+    so they see their own changes before the replicas do (see routers.py)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        check_pin_cache()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def wrote(request, response):
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+            and user is not None and user.is_authenticated
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            pin_to_primary(request.user.pk)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            await sync_to_async(pin_to_primary)(request.user.pk)
+        return response
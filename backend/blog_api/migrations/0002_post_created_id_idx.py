@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# The search index is vendor specific and lives outside the model: a stored,
+# weighted tsvector column with a GIN index on Postgres, and an external
+# content FTS5 table kept in sync by triggers on SQLite (used by the tests).
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE blog_api_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX post_search_vector_idx ON blog_api_post USING gin (search_vector)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS post_search_vector_idx',
+    'ALTER TABLE blog_api_post DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE blog_api_post_fts USING fts5(
+        title, content, content='blog_api_post', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER blog_api_post_fts_insert AFTER INSERT ON blog_api_post BEGIN
+        INSERT INTO blog_api_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_api_post_fts_delete AFTER DELETE ON blog_api_post BEGIN
+        INSERT INTO blog_api_post_fts(blog_api_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_api_post_fts_update AFTER UPDATE OF title, content ON blog_api_post BEGIN
+        INSERT INTO blog_api_post_fts(blog_api_post_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO blog_api_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO blog_api_post_fts(blog_api_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS blog_api_post_fts_insert',
+    'DROP TRIGGER IF EXISTS blog_api_post_fts_delete',
+    'DROP TRIGGER IF EXISTS blog_api_post_fts_update',
+    'DROP TABLE IF EXISTS blog_api_post_fts',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_api', '0002_post_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
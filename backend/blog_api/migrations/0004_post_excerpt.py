@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+def backfill_excerpts(apps, schema_editor):
+    Post = apps.get_model('blog_api', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=2000):
+        text = ' '.join(post.content.split())
+        if len(text) > 280:
+            text = text[:279].rsplit(' ', 1)[0] + '\u2026'
+        post.excerpt = text
+        batch.append(post)
+        if len(batch) >= 2000:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_api', '0003_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=300),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
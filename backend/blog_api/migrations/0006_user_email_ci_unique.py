@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:23
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def blank_duplicate_emails(apps, schema_editor):
+    # Emails were unique only case-sensitively, if at all. The oldest account
+    # keeps each address; later ones with the same email in any case lose it
+    # and log in by username until they set a new one.
+    User = apps.get_model('blog_api', 'User')
+    users = User.objects.exclude(email='').annotate(email_lower=Lower('email'))
+    duplicated = users.values('email_lower').annotate(accounts=Count('id')).filter(accounts__gt=1)
+    for email in duplicated.values_list('email_lower', flat=True):
+        later = users.filter(email_lower=email).order_by('id').values_list('id', flat=True)[1:]
+        User.objects.filter(id__in=list(later)).update(email='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog_api', '0005_post_author_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_ci_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    Post = apps.get_model('blog_api', 'Post')
+    Post.objects.using(schema_editor.connection.alias).update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_api', '0007_refreshtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        # Posts written before this migration were last modified when created
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_api', '0009_post_engagement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', models.SlugField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tagged', to='blog_api.post')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='blog_api.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', through='blog_api.PostTag', to='blog_api.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-post_created_at', '-post'], name='posttag_tag_created_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='posttag_post_tag_unique'),
+        ),
+    ]
@@ -1,14 +1,115 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 
+def make_excerpt(content):
+    """Plain summary of a post body, cut at a word boundary to POST_EXCERPT_LENGTH characters"""
+    length = getattr(settings, 'POST_EXCERPT_LENGTH', 280)
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    return text[:length - 1].rsplit(' ', 1)[0] + '\u2026'
+
 class User(AbstractUser):
-    pass
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Case-insensitive unique email, which also indexes email logins.
+            # Users without an email are left out.
+            models.UniqueConstraint(Lower('email'), condition=~models.Q(email=''), name='user_email_ci_unique'),
+        ]
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
 
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
-    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Indexed through post_author_created_id_idx, whose leading column is author_id
+    author = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Stored summary so list views never have to fetch the full content
+    excerpt = models.CharField(max_length=300, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every write; the detail ETag starts with it and If-Match compares against it
+    version = models.PositiveIntegerField(default=1)
+    # Denormalized engagement counts, updated in batches by engagement.counters
+    view_count = models.PositiveBigIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0)
+    tags = models.ManyToManyField(Tag, through='PostTag', related_name='posts', blank=True)
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the post feed (newest first)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            # Backs per-author feeds and the author foreign key
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_id_idx'),
+        ]
     
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        if not self._state.adding:
+            self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'updated_at', 'version'}
+            if 'content' in update_fields:
+                extra.add('excerpt')
+            kwargs['update_fields'] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
+
+class PostTag(models.Model):
+    # Indexed through posttag_tag_created_post_idx and posttag_post_tag_unique
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False, related_name='tagged')
+    # Copy of post.created_at (which never changes), so a tag feed is read in
+    # order from one index range without touching posts it does not return
+    post_created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Also serves tag lookups for a page of posts
+            models.UniqueConstraint(fields=['post', 'tag'], name='posttag_post_tag_unique'),
+        ]
+        indexes = [
+            # Backs per-tag feeds (newest first) and the tag foreign key
+            models.Index(fields=['tag', '-post_created_at', '-post'], name='posttag_tag_created_post_idx'),
+        ]
+
+class PostLike(models.Model):
+    # Indexed through postlike_user_post_unique, whose leading column is user_id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='post_likes')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # One like per user and post; liking twice is a no-op
+            models.UniqueConstraint(fields=['user', 'post'], name='postlike_user_post_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} likes {self.post_id}'
+
+class RefreshToken(models.Model):
+    """An issued refresh token, tracked for rotation and revocation (see tokens.py)"""
+    jti = models.CharField(max_length=64, unique=True)
+    # Tokens rotated from one login share a family
+    family = models.UUIDField(db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed for prune_refresh_tokens
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    # jti of the token this one was rotated into
+    replaced_by = models.CharField(max_length=64, blank=True, default='')
+
+    def __str__(self):
+        return self.jti
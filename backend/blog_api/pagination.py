@@ -0,0 +1,103 @@
+import base64
+import json
+from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 10
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    """Read page_size from the query string, clamped to POST_PAGE_SIZE_MAX"""
+    max_size = getattr(settings, 'POST_PAGE_SIZE_MAX', 100)
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, max_size))
+
+
+def encode_values(*values):
+    """Encode a keyset position as an opaque URL-safe token"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_values(cursor, length):
+    """Decode a token produced by encode_values, checking it holds `length` values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def encode_cursor(created_at, pk):
+    """Encode a (created_at, id) position as an opaque URL-safe token"""
+    return encode_values(created_at.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    """Decode a token produced by encode_cursor back into (created_at, id)"""
+    created_at, pk = decode_values(cursor, 2)
+    try:
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor')
+    return created_at, pk
+
+
+def keyset_queryset(queryset, cursor, page_size, created_field='created_at', id_field='id'):
+    """
+    Slice a values() queryset to the page after `cursor`, newest first, with
+    one extra row to detect a next page. The queryset is seeked past the cursor
+    position instead of OFFSET, so every page costs the same index range scan.
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{created_field}__lt': created_at}) |
+            Q(**{created_field: created_at, f'{id_field}__lt': pk})
+        )
+    return queryset.order_by(f'-{created_field}', f'-{id_field}')[:page_size + 1]
+
+
+def keyset_split(rows, page_size, created_field='created_at', id_field='id'):
+    """Trim the look-ahead row fetched by keyset_queryset and build the next cursor"""
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[created_field], last[id_field])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor, page_size, created_field='created_at', id_field='id'):
+    """Return (rows, next_cursor) for one page of a values() queryset ordered newest first"""
+    rows = list(keyset_queryset(queryset, cursor, page_size, created_field, id_field))
+    return keyset_split(rows, page_size, created_field, id_field)
+
+
+def page_bounds(page_number, page_size, count):
+    """
+    Validate a page number against a known total, falling back to the first
+    page like Paginator.page, and return (number, num_pages, offset)
+    """
+    paginator = Paginator([], page_size)
+    paginator.count = count
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage:
+        number = 1
+    return number, paginator.num_pages, (number - 1) * page_size
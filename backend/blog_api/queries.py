@@ -0,0 +1,138 @@
+from django.conf import settings
+from .counts import COUNT_MODES
+from .models import Post
+from .pagination import get_page_size, keyset_queryset, keyset_split, page_bounds
+
+POST_LIST_FIELDS = ('id', 'title', 'content', 'author__username', 'created_at', 'view_count', 'like_count')
+# Fields a listing may select with ?fields=
+POST_SELECTABLE_FIELDS = (
+    'id', 'title', 'content', 'excerpt', 'author__username', 'created_at', 'view_count', 'like_count', 'tags',
+)
+# ?view=excerpt swaps the full body for the stored excerpt
+POST_EXCERPT_FIELDS = ('id', 'title', 'excerpt', 'author__username', 'created_at', 'view_count', 'like_count')
+# Not a column: listings fill it in with tags.attach_tags, one query per page
+TAGS_FIELD = 'tags'
+
+
+def parse_fields(request):
+    """Fields to return for a listing, from ?fields= or ?view=. Raises ValueError."""
+    view = request.GET.get('view', 'full')
+    if view not in ('full', 'excerpt'):
+        raise ValueError('view must be one of: full, excerpt')
+    if not request.GET.get('fields'):
+        return (POST_EXCERPT_FIELDS if view == 'excerpt' else POST_LIST_FIELDS) + (TAGS_FIELD,)
+
+    fields = tuple(dict.fromkeys(name.strip() for name in request.GET['fields'].split(',') if name.strip()))
+    unknown = [name for name in fields if name not in POST_SELECTABLE_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"fields must be a comma separated subset of: {', '.join(POST_SELECTABLE_FIELDS)}")
+    return fields
+
+
+def select_columns(fields, *required):
+    """Post columns to select for fields, plus the required ones (e.g. sort keys)"""
+    return tuple(dict.fromkeys([name for name in fields if name != TAGS_FIELD] + list(required)))
+
+
+def drop_unselected(rows, columns, fields):
+    """Remove the columns that were only selected to page or tag rows"""
+    extra = set(columns).difference(fields)
+    if extra:
+        rows = [{k: v for k, v in row.items() if k not in extra} for row in rows]
+    return rows
+
+
+class PostListQuery:
+    """
+    Query parameters of a post listing request, shared by the sync and async
+    list views so that only the way rows are fetched differs between them.
+    Raises ValueError for invalid parameters.
+    """
+    def __init__(self, request):
+        self.page_size = get_page_size(request)
+        # Cursor mode seeks on (created_at, id) instead of OFFSET and skips the COUNT(*)
+        self.cursor = request.GET.get('cursor') if 'cursor' in request.GET else None
+        self.count_mode = request.GET.get('count', getattr(settings, 'POST_COUNT_MODE', 'estimate'))
+        if self.count_mode not in COUNT_MODES:
+            raise ValueError(f"count must be one of: {', '.join(COUNT_MODES)}")
+        self.page_number = request.GET.get('page', 1)
+        self.fields = parse_fields(request)
+        self.with_tags = TAGS_FIELD in self.fields
+
+        if self.cursor is not None:
+            self.count_mode = 'none'
+            self.queryset = keyset_queryset(self.base_queryset(), self.cursor, self.page_size)
+
+    @property
+    def is_cursor(self):
+        return self.cursor is not None
+
+    @property
+    def columns(self):
+        # Only the selected columns are fetched; the cursor also needs its sort
+        # keys, and tags are looked up by id
+        if self.is_cursor:
+            return select_columns(self.fields, 'created_at', 'id')
+        return select_columns(self.fields, 'id') if self.with_tags else select_columns(self.fields)
+
+    def base_queryset(self):
+        return Post.objects.all().values(*self.columns)
+
+    def page_queryset(self, count):
+        """Queryset for the requested page, given the total from get_post_count"""
+        if self.is_cursor:
+            return self.queryset
+
+        posts = self.base_queryset().order_by('-created_at', '-id')
+        # Without a total we cannot validate the page number, so slice one row past the page instead
+        if count is None:
+            try:
+                self.page_number = max(1, int(self.page_number))
+            except (TypeError, ValueError):
+                self.page_number = 1
+            self.pages = None
+            offset = (self.page_number - 1) * self.page_size
+            return posts[offset:offset + self.page_size + 1]
+
+        self.page_number, self.pages, offset = page_bounds(self.page_number, self.page_size, count)
+        return posts[offset:offset + self.page_size]
+
+    def payload(self, rows, count):
+        if self.is_cursor:
+            rows, next_cursor = keyset_split(rows, self.page_size)
+            rows = drop_unselected(rows, self.columns, self.fields)
+            return {
+                'posts': rows,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None,
+                'page_size': self.page_size,
+            }
+
+        if count is None:
+            has_next = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+        else:
+            has_next = self.page_number < self.pages
+        rows = drop_unselected(rows, self.columns, self.fields)
+        return {
+            'posts': rows,
+            'page': self.page_number,
+            'pages': self.pages,
+            'has_next': has_next,
+            'has_previous': self.page_number > 1,
+            'total_posts': count,
+        }
+
+
+def post_payload(post, author_username):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'content': post.content,
+        'author': author_username,
+        'created_at': post.created_at,
+        'updated_at': post.updated_at,
+        'version': post.version,
+        'view_count': post.view_count,
+        'like_count': post.like_count,
+    }
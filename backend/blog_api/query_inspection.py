@@ -0,0 +1,98 @@
+"""
+Query budgets for tests and N+1/slow query detection for development.
+
+query_budget() fails a test when a block issues more queries than allowed.
+QueryInspector records every query of a request together with the line of
+project code that issued it, so QueryInspectionMiddleware can point at the
+loop behind an N+1 pattern or the call site of a slow query.
+"""
+import os
+import time
+import traceback
+from collections import defaultdict
+from contextlib import ContextDecorator
+from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+# Execute wrappers live here and in the middleware; their frames are never the origin
+_WRAPPER_FILES = {os.path.abspath(__file__), os.path.join(os.path.dirname(os.path.abspath(__file__)), 'middleware.py')}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail when the wrapped block or function runs more than max_queries
+    queries on the given database. Usable as a context manager or decorator:
+
+        with query_budget(3):
+            self.client.get(url)
+    """
+    def __init__(self, max_queries, using='default'):
+        self.max_queries = max_queries
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.context.__exit__(exc_type, exc_value, tb)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}' for number, query in enumerate(self.context.captured_queries, 1)
+            )
+            raise QueryBudgetExceeded(
+                f'{executed} queries executed, budget is {self.max_queries}:\n{queries}'
+            )
+        return False
+
+
+def query_origin():
+    """'path:line in function' of the innermost project frame that issued a query"""
+    root = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename in _WRAPPER_FILES or not filename.startswith(root) or 'site-packages' in filename:
+            continue
+        return f'{os.path.relpath(filename, root)}:{frame.lineno} in {frame.name}'
+    return '<unknown>'
+
+
+class QueryInspector:
+    """Execute wrapper recording (sql, params, duration, origin) of every query"""
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start) / 1e6
+            self.queries.append((sql, params, duration_ms, query_origin()))
+
+    def repeated(self, threshold):
+        """
+        Statements run at least threshold times, as (sql, count, origins, duplicate).
+        duplicate is True when every run had the same parameters; otherwise the
+        same statement ran with different parameters, the usual N+1 shape.
+        """
+        groups = defaultdict(list)
+        for sql, params, _, origin in self.queries:
+            groups[sql].append((repr(params), origin))
+        for sql, runs in groups.items():
+            if len(runs) >= threshold:
+                duplicate = len({params for params, _ in runs}) == 1
+                origins = sorted({origin for _, origin in runs})
+                yield sql, len(runs), origins, duplicate
+
+    def slow(self, threshold_ms):
+        return [(sql, duration, origin) for sql, _, duration, origin in self.queries if duration >= threshold_ms]
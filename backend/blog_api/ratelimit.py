@@ -0,0 +1,194 @@
+"""
+Rate limiting for expensive or abusable endpoints.
+
+Limits are configured per scope in settings.RATE_LIMITS, e.g.
+
+    RATE_LIMITS = {'login': {'ip': '10/m'}, 'post_create': {'user': '30/m'}}
+
+where each rate is "<requests>/<period>" with an optional period multiplier
+("100/5m"). A view decorated with @ratelimit('login') answers 429 with a
+Retry-After header once any of its buckets is empty.
+
+The local backend keeps token buckets in process memory, so the allowed
+path is a dict lookup and some arithmetic under a lock; limits then apply
+per worker process. The cache backend shares limits between workers. Django's
+cache API offers atomic incr but no compare-and-set, so it approximates the
+bucket with a sliding window over two atomically incremented counters.
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from .responses import JsonResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/m' -> (10, 60.0): capacity and the seconds it takes to refill"""
+    match = _RATE_RE.match(rate.replace(' ', ''))
+    if not match:
+        raise ValueError(f'Invalid rate {rate!r}; expected e.g. "10/m" or "100/5m"')
+    count, multiplier, unit = match.groups()
+    return int(count), float(int(multiplier or 1) * PERIODS[unit])
+
+
+class LocalBackend:
+    """Token buckets in process memory, least recently used keys evicted past max_keys"""
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, period):
+        """Take a token; returns 0 if allowed, else the seconds until one is available"""
+        now = time.monotonic()
+        refill = capacity / period
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / refill
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBackend:
+    """Sliding window over per-period counters in a shared cache"""
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def hit(self, key, capacity, period):
+        cache = caches[self.alias]
+        now = time.time()
+        window = int(now // period)
+        current_key, previous_key = f'{key}:{window}', f'{key}:{window - 1}'
+        # add() is a no-op if the counter exists, and incr() is atomic in Redis and memcached
+        cache.add(current_key, 0, int(period * 2) + 1)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(current_key, 1, int(period * 2) + 1)
+            current = 1
+        previous = cache.get(previous_key, 0)
+        # Requests from the previous window count in proportion to its overlap with the last `period` seconds
+        elapsed = now / period - window
+        weighted = previous * (1 - elapsed) + current
+        if weighted <= capacity:
+            return 0
+        # Rejected requests do not use up the allowance, as with the local buckets
+        cache.decr(current_key)
+        if previous and current <= capacity:
+            # Wait until enough of the previous window has slid out
+            return max(0.0, ((weighted - capacity) / previous) * period)
+        return (1 - elapsed) * period
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    name = getattr(settings, 'RATE_LIMIT_BACKEND', 'local')
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                if name == 'cache':
+                    backend = CacheBackend(getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default'))
+                elif name == 'local':
+                    backend = LocalBackend(getattr(settings, 'RATE_LIMIT_LOCAL_MAX_KEYS', 100000))
+                else:
+                    raise ValueError(f"RATE_LIMIT_BACKEND must be 'local' or 'cache', not {name!r}")
+                _backends[name] = backend
+    return backend
+
+
+def client_ip(request):
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        # The first address is the client as seen by the trusted proxy
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def _identity(request, kind):
+    if kind == 'ip':
+        return client_ip(request)
+    if kind == 'user':
+        user = getattr(request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+    raise ValueError(f"Rate limit key must be 'ip' or 'user', not {kind!r}")
+
+
+def check(scope, request):
+    """Consume a token from each of the scope's buckets; returns 0 or seconds to wait"""
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return 0
+    limits = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+    if not limits:
+        return 0
+    backend = get_backend()
+    retry_after = 0
+    for kind, rate in limits.items():
+        identity = _identity(request, kind)
+        if identity is None:
+            continue
+        capacity, period = parse_rate(rate)
+        retry_after = max(retry_after, backend.hit(f'ratelimit:{scope}:{kind}:{identity}', capacity, period))
+    return retry_after
+
+
+def too_many_requests(retry_after):
+    response = JsonResponse({'error': 'Too many requests'}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def ratelimit(scope):
+    """Decorator limiting a view (sync or async) by the buckets configured for scope"""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if isinstance(get_backend(), CacheBackend):
+                    retry_after = await sync_to_async(check)(scope, request)
+                else:
+                    retry_after = check(scope, request)
+                if retry_after:
+                    return too_many_requests(retry_after)
+                return await view_func(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            retry_after = check(scope, request)
+            if retry_after:
+                return too_many_requests(retry_after)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,159 @@
+import hashlib
+import math
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(scope):
+    return f'gen:{scope}'
+
+
+def get_generations(scopes):
+    """
+    Current generation of each scope. A generation is the time the scope was
+    last invalidated, so it doubles as the Last-Modified value.
+    """
+    cache = get_cache()
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, None)
+        found.update(cache.get_many(list(missing)))
+    return [found.get(key, missing.get(key)) for key in keys]
+
+
+def bump_generation(*scopes):
+    """Invalidate every cached response that depends on any of the scopes"""
+    now = time.time()
+    get_cache().set_many({_generation_key(scope): now for scope in scopes}, None)
+
+
+def _lookup(request, key_func, args, kwargs):
+    scopes, key = key_func(request, *args, **kwargs)
+    generations = get_generations(scopes)
+    fingerprint = hashlib.md5(
+        f"{key}|{'|'.join(repr(g) for g in generations)}".encode()
+    ).hexdigest()
+    return fingerprint, max(generations), get_cache().get(f'response:{fingerprint}')
+
+
+def _store(fingerprint, response):
+    # Views may set their own validator (e.g. a row version); keep it
+    if not response.has_header('ETag'):
+        response['ETag'] = quote_etag(fingerprint)
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': response['ETag'],
+    }
+    get_cache().set(f'response:{fingerprint}', entry, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+    return entry
+
+
+def _http_last_modified(generation):
+    """
+    Last-Modified in whole seconds for a generation, or None while its second
+    is still running: another write in that second would get the same
+    Last-Modified, and If-Modified-Since would then answer 304 for stale data.
+    Those responses are validated by their ETag alone.
+    """
+    last_modified = math.ceil(generation)
+    return last_modified if time.time() >= last_modified else None
+
+
+def _finish(request, response, entry, generation):
+    last_modified = _http_last_modified(generation)
+    not_modified = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    elif response is None:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+
+    response['ETag'] = entry['etag']
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _cacheable(response, generation):
+    if response.status_code != 200 or response.streaming:
+        return False
+    # A replica may not have replayed the write that last bumped the generation;
+    # cached, its answer would outlive the writer's pin to the primary
+    if getattr(response, 'replica', None):
+        return time.time() - generation >= getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    return True
+
+
+def cache_response(key_func):
+    """
+    Cache successful responses of a GET view under key_func(request, *args, **kwargs),
+    which returns (scopes, key). Entries are keyed by the scopes' generations, so
+    bumping a generation makes them unreachable. Conditional requests are
+    answered with 304 from the cached ETag/Last-Modified without rebuilding the body.
+    Works for both sync and async views.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                fingerprint, generation, entry = await sync_to_async(_lookup)(request, key_func, args, kwargs)
+                response = None
+                if entry is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if not _cacheable(response, generation):
+                        return response
+                    entry = await sync_to_async(_store)(fingerprint, response)
+                return _finish(request, response, entry, generation)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            fingerprint, generation, entry = _lookup(request, key_func, args, kwargs)
+            response = None
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if not _cacheable(response, generation):
+                    return response
+                entry = _store(fingerprint, response)
+            return _finish(request, response, entry, generation)
+
+        return wrapper
+    return decorator
+
+
+def _query_string(request):
+    return '&'.join(f'{name}={value}' for name, values in sorted(request.GET.lists()) for value in values)
+
+
+def post_list_key(request, *args, **kwargs):
+    return ['posts'], f'post_list?{_query_string(request)}'
+
+
+def author_post_list_key(request, username, *args, **kwargs):
+    return ['posts'], f'author_post_list:{username}?{_query_string(request)}'
+
+
+def tag_post_list_key(request, slug, *args, **kwargs):
+    return ['posts'], f'tag_post_list:{slug}?{_query_string(request)}'
+
+
+def post_search_key(request, *args, **kwargs):
+    return ['posts'], f'post_search?{_query_string(request)}'
+
+
+def post_detail_key(request, post_id, *args, **kwargs):
+    return [f'post:{post_id}'], f'post_detail:{post_id}'
@@ -0,0 +1,43 @@
+"""
+JSON encoding for API responses.
+
+Uses orjson when it is installed, which serializes values() rows and their
+datetimes natively in C, and falls back to the stdlib encoder with
+DjangoJSONEncoder otherwise.
+"""
+import datetime
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class _Encoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder emitting datetimes the way orjson does (full precision, Z for UTC)"""
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+_encoder = _Encoder(separators=(',', ':'))
+
+
+def dumps(data):
+    """Serialize data to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_UTC_Z)
+    return _encoder.encode(data).encode()
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in replacement for django.http.JsonResponse using dumps()"""
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
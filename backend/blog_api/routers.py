@@ -0,0 +1,223 @@
+"""
+Read replica routing.
+
+Writes always go to the primary. Reads go to a replica only inside a view
+decorated with @replica_reads (post listings, detail, search and export), so
+anything not explicitly marked, including the reads a write path makes, stays
+on the primary.
+
+Replication is asynchronous, so two things keep replica reads sensible:
+
+- Read-your-writes: a successful write by an authenticated user pins that
+  user's reads to the primary for REPLICA_PIN_SECONDS (see
+  middleware.ReplicaPinMiddleware), long enough for the replicas to catch up.
+  Pins live in the default cache, which every worker must share (Redis), so
+  a per-process cache is refused at startup.
+- Fallback: each replica's health and lag are checked at most every
+  REPLICA_CHECK_INTERVAL seconds per process. A replica that is down or more
+  than REPLICA_MAX_LAG_SECONDS behind is skipped until its next check, and a
+  view whose replica fails mid-request is retried on the primary.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from functools import wraps
+import jwt
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from .utils import bearer_token
+
+logger = logging.getLogger(__name__)
+
+# Database reads are sent to within the current request, or None for the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+POSTGRES_LAG = (
+    # Zero while the replica has replayed everything it received, which keeps an
+    # idle primary (no new transactions to replay) from reading as lag
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def replica_aliases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaHealth:
+    """Per-process record of which replicas are usable, refreshed every interval seconds"""
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def available(self, alias):
+        now = time.monotonic()
+        checked = self._checked.get(alias)
+        if checked is not None and now - checked[1] < getattr(settings, 'REPLICA_CHECK_INTERVAL', 5):
+            return checked[0]
+        with self._lock:
+            # Another thread may have just checked
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[1] < getattr(settings, 'REPLICA_CHECK_INTERVAL', 5):
+                return checked[0]
+            healthy = self.check(alias)
+            self._checked[alias] = (healthy, time.monotonic())
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(POSTGRES_LAG if connection.vendor == 'postgresql' else 'SELECT 0')
+                lag = cursor.fetchone()[0]
+        except DatabaseError as e:
+            logger.warning('Replica %s is unavailable: %s', alias, e)
+            return False
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        if lag is not None and lag > max_lag:
+            logger.warning('Replica %s is %.1fs behind (limit %ss)', alias, lag, max_lag)
+            return False
+        return True
+
+    def mark_unavailable(self, alias):
+        self._checked[alias] = (False, time.monotonic())
+
+    def clear(self):
+        self._checked.clear()
+
+
+health = ReplicaHealth()
+
+
+def check_pin_cache():
+    """Raise ImproperlyConfigured when the default cache cannot carry pins between workers"""
+    backend = caches['default']
+    if isinstance(backend, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f'REPLICA_DATABASES needs a default cache shared by all workers (e.g. Redis) to pin '
+            f'writers to the primary; {type(backend).__name__} is per process'
+        )
+
+
+def _pin_key(user_id):
+    return f'replica_pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send this user's replica reads to the primary while replicas catch up with their write"""
+    cache.set(_pin_key(user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def _is_pinned(request):
+    token = bearer_token(request)
+    if not token:
+        # Anonymous readers have no writes of their own to see
+        return False
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return False
+    return cache.get(_pin_key(payload.get('user_id'))) is not None
+
+
+def choose_replica(request):
+    """A healthy replica to read from, or None when reads should go to the primary"""
+    aliases = replica_aliases()
+    if not aliases or _is_pinned(request):
+        return None
+    candidates = [alias for alias in aliases if health.available(alias)]
+    return random.choice(candidates) if candidates else None
+
+
+def _stream_from(alias, iterator):
+    # Streaming bodies are consumed after the view returns, outside its routing context
+    token = _read_alias.set(alias)
+    try:
+        yield from iterator
+    finally:
+        _read_alias.reset(token)
+
+
+def _read_from(alias, view_func, request, args, kwargs):
+    token = _read_alias.set(alias)
+    try:
+        response = view_func(request, *args, **kwargs)
+    finally:
+        _read_alias.reset(token)
+    if response.streaming:
+        response.streaming_content = _stream_from(alias, response.streaming_content)
+    response.replica = alias
+    return response
+
+
+async def _aread_from(alias, view_func, request, args, kwargs):
+    token = _read_alias.set(alias)
+    try:
+        response = await view_func(request, *args, **kwargs)
+    finally:
+        _read_alias.reset(token)
+    response.replica = alias
+    return response
+
+
+def replica_reads(view_func):
+    """
+    Run a read-only view (sync or async) against a replica when one is healthy
+    and the requesting user has not written recently. A view that fails with a
+    database error on the replica is retried on the primary.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # Skip the executor hop entirely when no replicas are configured
+            alias = await sync_to_async(choose_replica)(request) if replica_aliases() else None
+            if alias is None:
+                return await view_func(request, *args, **kwargs)
+            try:
+                return await _aread_from(alias, view_func, request, args, kwargs)
+            except DatabaseError as e:
+                logger.warning('Read from replica %s failed, retrying on the primary: %s', alias, e)
+                health.mark_unavailable(alias)
+                return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        alias = choose_replica(request)
+        if alias is None:
+            return view_func(request, *args, **kwargs)
+        try:
+            return _read_from(alias, view_func, request, args, kwargs)
+        except DatabaseError as e:
+            logger.warning('Read from replica %s failed, retrying on the primary: %s', alias, e)
+            health.mark_unavailable(alias)
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
@@ -0,0 +1,134 @@
+"""
+Ranked full-text search over posts.
+
+Postgres matches against the stored, weighted search_vector column (title
+weighted above content) through its GIN index; SQLite uses the FTS5 table
+created by migration 0003. Results are ordered by rank and paged with a
+(rank, id) cursor.
+"""
+import re
+from django.db import connections, router
+from .models import Post
+from .pagination import InvalidCursor, decode_values, encode_values
+from .queries import POST_LIST_FIELDS
+
+POSTGRES_SEARCH = """
+    SELECT id, rank FROM (
+        SELECT p.id, ts_rank(p.search_vector, q)::float8 AS rank
+        FROM blog_api_post p, websearch_to_tsquery('english', %s) q
+        WHERE p.search_vector @@ q
+    ) matches
+    {where}
+    ORDER BY rank DESC, id DESC
+    LIMIT %s
+"""
+
+# bm25() is lower-is-better, so negate it; title hits weigh 10x content hits
+SQLITE_SEARCH = """
+    SELECT id, rank FROM (
+        SELECT rowid AS id, -bm25(blog_api_post_fts, 10.0, 1.0) AS rank
+        FROM blog_api_post_fts
+        WHERE blog_api_post_fts MATCH %s
+    ) matches
+    {where}
+    ORDER BY rank DESC, id DESC
+    LIMIT %s
+"""
+
+
+class SearchUnavailable(Exception):
+    """The database has no full-text search implementation here"""
+
+
+SQLITE_INDEX = {
+    'blog_api_post_fts': """
+        CREATE VIRTUAL TABLE blog_api_post_fts USING fts5(
+            title, content, content='blog_api_post', content_rowid='id'
+        )
+    """,
+    'blog_api_post_fts_insert': """
+        CREATE TRIGGER blog_api_post_fts_insert AFTER INSERT ON blog_api_post BEGIN
+            INSERT INTO blog_api_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """,
+    'blog_api_post_fts_delete': """
+        CREATE TRIGGER blog_api_post_fts_delete AFTER DELETE ON blog_api_post BEGIN
+            INSERT INTO blog_api_post_fts(blog_api_post_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+        END
+    """,
+    'blog_api_post_fts_update': """
+        CREATE TRIGGER blog_api_post_fts_update AFTER UPDATE OF title, content ON blog_api_post BEGIN
+            INSERT INTO blog_api_post_fts(blog_api_post_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO blog_api_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    """,
+}
+
+
+def ensure_sqlite_search_index(connection):
+    """
+    Recreate the SQLite FTS5 table or triggers if missing. SQLite migrations
+    that alter blog_api_post rebuild the table, which drops its triggers.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'blog_api_post_fts%'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SQLITE_INDEX if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_INDEX[name])
+        cursor.execute("INSERT INTO blog_api_post_fts(blog_api_post_fts) VALUES ('rebuild')")
+
+
+def _sqlite_match(query):
+    # Quote every term so user input cannot use FTS5 query syntax
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_posts(query, cursor, page_size, using=None):
+    """
+    Return (rows, next_cursor) for posts matching `query`, best match first.
+    Raises SearchUnavailable on databases other than Postgres and SQLite.
+    """
+    using = using or router.db_for_read(Post)
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        sql, match = POSTGRES_SEARCH, query
+    elif connection.vendor == 'sqlite':
+        sql, match = SQLITE_SEARCH, _sqlite_match(query)
+    else:
+        raise SearchUnavailable(f'Full-text search is not supported on {connection.vendor}')
+    if not match:
+        return [], None
+
+    where, params = '', [match]
+    if cursor:
+        rank, pk = decode_values(cursor, 2)
+        if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+            raise InvalidCursor('Invalid cursor')
+        where = 'WHERE rank < %s OR (rank = %s AND id < %s)'
+        params += [rank, rank, pk]
+    params.append(page_size + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql.format(where=where), params)
+        matches = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(matches) > page_size:
+        matches = matches[:page_size]
+        last_id, last_rank = matches[-1]
+        next_cursor = encode_values(last_rank, last_id)
+
+    ranks = dict(matches)
+    posts = Post.objects.using(using).filter(id__in=ranks).values(*POST_LIST_FIELDS)
+    rows = sorted(posts, key=lambda row: (ranks[row['id']], row['id']), reverse=True)
+    for row in rows:
+        row['rank'] = ranks[row['id']]
+    return rows, next_cursor
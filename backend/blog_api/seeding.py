@@ -0,0 +1,193 @@
+"""
+Synthetic users and posts for benchmarks, inserted in batches.
+
+Everything comes from a random.Random seeded by the caller, so the same seed
+always produces the same titles, bodies, authorship and dates (counted back
+from a fixed epoch, not the current time). Users share one password
+hashed up front. Posts are written with batched INSERTs, or with COPY on
+Postgres, neither of which sends signals, so seed_posts() computes excerpts
+itself and resets the cached counts and listings afterwards.
+"""
+import datetime
+import io
+import random
+from django.core.cache import cache
+from django.db import connections
+from .counts import author_post_count, post_count
+from .hashing import hash_password
+from .models import Post, User, make_excerpt
+from .response_cache import bump_generation
+
+WORDS = (
+    'api async backend benchmark blog branch browser buffer build cache client cloud cluster code commit compiler '
+    'config container cursor data database debug deploy design django docker endpoint engine error event feature '
+    'feed field framework function graph handler header index input integration interface kernel latency layer '
+    'library limit linux load lock log loop memory merge message metric migration model module network node object '
+    'offset optimize package page parser patch performance pipeline plan pool post process profile protocol proxy '
+    'python query queue rate react record redis refactor release replica request response review route runtime '
+    'scale schema search server service session shard socket source stack storage stream string system table test '
+    'thread throughput token trace traffic transaction tree type update upgrade user value version view worker '
+    'write'
+).split()
+
+# Generated dates end here unless the caller passes another end
+SEED_EPOCH = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+COPY_COLUMNS = (
+    'title', 'content', 'excerpt', 'author_id', 'created_at', 'updated_at', 'version', 'view_count', 'like_count',
+)
+
+
+def post_text(rng):
+    """(title, content) of one synthetic post"""
+    # One choices() call per post; sentences are cut from the drawn words
+    lengths = [rng.randint(6, 18) for _ in range(rng.randint(3, 20))]
+    title_length = rng.randint(3, 9)
+    words = rng.choices(WORDS, k=title_length + sum(lengths))
+    title = ' '.join(words[:title_length]).capitalize()
+    sentences = []
+    position = title_length
+    for length in lengths:
+        sentences.append(' '.join(words[position:position + length]).capitalize() + '.')
+        position += length
+    # Paragraphs of up to four sentences
+    paragraphs = [' '.join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+    return title, '\n\n'.join(paragraphs)
+
+
+def seed_users(count, prefix='user', password='password123', start=0, batch_size=5000):
+    """
+    Create users {prefix}{start} .. {prefix}{start + count - 1} with one shared
+    password hash, skipping usernames that already exist. Returns their ids in order.
+    """
+    encoded = hash_password(password)
+    usernames = [f'{prefix}{i}' for i in range(start, start + count)]
+    for offset in range(0, count, batch_size):
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=encoded)
+            for username in usernames[offset:offset + batch_size]
+        ], ignore_conflicts=True)
+
+    ids = {}
+    for offset in range(0, count, batch_size):
+        batch = usernames[offset:offset + batch_size]
+        ids.update(User.objects.filter(username__in=batch).values_list('username', 'id'))
+    return [ids[username] for username in usernames]
+
+
+def generate_posts(author_ids, count, seed=0, days=365, skewed=True, until=SEED_EPOCH):
+    """
+    Yield (title, content, excerpt, author_id, created_at) tuples. With skewed,
+    authors lean towards the start of author_ids, as a few prolific writers
+    do; otherwise they take turns. created_at is spread over the `days` days
+    before `until`.
+    """
+    rng = random.Random(seed)
+    span = days * 86400
+    for index in range(count):
+        title, content = post_text(rng)
+        if skewed:
+            author_id = author_ids[int(len(author_ids) * rng.random() ** 2)]
+        else:
+            author_id = author_ids[index % len(author_ids)]
+        created_at = until - datetime.timedelta(seconds=rng.random() * span)
+        yield title, content, make_excerpt(content), author_id, created_at
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_escape(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_rows(batch):
+    # Generated posts have never been edited, viewed or liked
+    for title, content, excerpt, author_id, created_at in batch:
+        yield title, content, excerpt, author_id, created_at, created_at, 1, 0, 0
+
+
+def _insert_batch(cursor, connection, batch):
+    # Plain INSERTs keep the generated timestamps, which bulk_create would
+    # replace through the fields' auto_now_add/auto_now
+    fields = [Post._meta.get_field(column) for column in COPY_COLUMNS]
+    sql = (
+        f"INSERT INTO {connection.ops.quote_name(Post._meta.db_table)} "
+        f"({', '.join(connection.ops.quote_name(column) for column in COPY_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(COPY_COLUMNS))})"
+    )
+    cursor.executemany(sql, [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+        for row in _copy_rows(batch)
+    ])
+
+
+def _copy_batch(cursor, batch):
+    sql = f"COPY {Post._meta.db_table} ({', '.join(COPY_COLUMNS)}) FROM STDIN"
+    if hasattr(cursor, 'copy_expert'):
+        # psycopg2
+        buffer = io.StringIO()
+        for row in _copy_rows(batch):
+            buffer.write('\t'.join(_copy_escape(value) for value in row) + '\n')
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with cursor.copy(sql) as copy:
+            for row in _copy_rows(batch):
+                copy.write_row(row)
+
+
+def seed_posts(author_ids, count, seed=0, days=365, batch_size=5000, method='auto', using='default',
+               skewed=True, progress=None, until=SEED_EPOCH):
+    """
+    Insert count generated posts. method is 'bulk' (batched INSERTs), 'copy'
+    (Postgres COPY) or 'auto' (COPY when the database is Postgres).
+    progress(inserted) is called after each batch. Returns the method used.
+    """
+    connection = connections[using]
+    if method == 'auto':
+        method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+    if method == 'copy' and connection.vendor != 'postgresql':
+        raise ValueError('COPY is only available on PostgreSQL')
+
+    inserted = 0
+    rows = generate_posts(author_ids, count, seed, days, skewed, until)
+    if method == 'copy':
+        with connection.cursor() as cursor:
+            for batch in _batches(rows, batch_size):
+                _copy_batch(cursor, batch)
+                inserted += len(batch)
+                if progress:
+                    progress(inserted)
+    else:
+        with connection.cursor() as cursor:
+            for batch in _batches(rows, batch_size):
+                _insert_batch(cursor, connection, batch)
+                inserted += len(batch)
+                if progress:
+                    progress(inserted)
+
+    if connection.vendor == 'postgresql':
+        # Refresh planner statistics, which also back the estimated post count
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Post._meta.db_table}')
+    reset_post_caches(set(author_ids))
+    return method
+
+
+def reset_post_caches(author_ids):
+    """Drop cached counts and listings that bulk inserts bypassed"""
+    post_count.reset()
+    cache.delete_many([author_post_count(author_id).key for author_id in author_ids])
+    bump_generation('posts')
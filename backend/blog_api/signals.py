@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .counts import author_post_count, post_count, tag_post_count
+from .metrics import registry
+from .models import Post, PostTag
+from .response_cache import bump_generation
+from .search import ensure_sqlite_search_index
+from .user_cache import user_cache
+from .utils import ACCESS_TOKEN_LIFETIME
+
+User = get_user_model()
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached principal whenever a user changes"""
+    if instance.is_active:
+        user_cache.invalidate(instance.pk)
+    else:
+        user_cache.revoke(instance.pk, ACCESS_TOKEN_LIFETIME.total_seconds())
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    user_cache.revoke(instance.pk, ACCESS_TOKEN_LIFETIME.total_seconds())
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if created:
+        post_count.incr()
+        author_post_count(instance.author_id).incr()
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    post_count.incr(-1)
+    author_post_count(instance.author_id).incr(-1)
+
+@receiver(post_delete, sender=PostTag)
+def count_untagged_post(sender, instance, **kwargs):
+    """Covers tags removed on their own and with their post or author"""
+    tag_post_count(instance.tag_id).incr(-1)
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_responses(sender, instance, **kwargs):
+    """Expire cached list pages and this post's detail response"""
+    bump_generation('posts', f'post:{instance.pk}')
+
+@receiver(post_migrate)
+def repair_sqlite_search_index(sender, using, **kwargs):
+    if sender.name == 'blog_api' and connections[using].vendor == 'sqlite':
+        ensure_sqlite_search_index(connections[using])
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    """Count connection setups, which persistent connections avoid for most requests"""
+    registry.inc('db_connections_opened_total', f'database="{connection.alias}"')
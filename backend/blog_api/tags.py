@@ -0,0 +1,90 @@
+"""
+Post tags.
+
+Each PostTag row carries a copy of its post's created_at, so a tag feed walks
+posttag_tag_created_post_idx in order and joins only the posts on the page.
+Listings attach tags to a page of posts with one query, and the number of
+posts per tag is a CachedCount adjusted as tags are added and removed.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils.text import slugify
+from .counts import tag_post_count
+from .models import Post, PostTag, Tag
+from .response_cache import bump_generation
+
+MAX_TAGS_PER_POST = 10
+TAG_NAME_LENGTH = 50
+
+
+def parse_tags(value):
+    """[(slug, name)] for a list of tag names, one per slug. Raises ValueError."""
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError('tags must be a list of strings')
+    tags = {}
+    for name in value:
+        name = ' '.join(name.split())[:TAG_NAME_LENGTH]
+        slug = slugify(name)[:TAG_NAME_LENGTH]
+        if not slug:
+            raise ValueError(f'Invalid tag: {name!r}')
+        tags.setdefault(slug, name)
+    if len(tags) > MAX_TAGS_PER_POST:
+        raise ValueError(f'A post can have at most {MAX_TAGS_PER_POST} tags')
+    return list(tags.items())
+
+
+def _tag_ids(tags):
+    if not tags:
+        return set()
+    # The first post to use a tag names it
+    Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in tags], ignore_conflicts=True)
+    return set(Tag.objects.filter(slug__in=[slug for slug, _ in tags]).values_list('id', flat=True))
+
+
+def set_post_tags(post, tags, created=False):
+    """Replace the tags of post with tags (from parse_tags); created skips reading the current ones"""
+    wanted = _tag_ids(tags)
+    current = set() if created else set(PostTag.objects.filter(post_id=post.id).values_list('tag_id', flat=True))
+    removed, added = current - wanted, wanted - current
+    if removed:
+        # signals.count_untagged_post adjusts the counts
+        PostTag.objects.filter(post_id=post.id, tag_id__in=removed).delete()
+    if added:
+        PostTag.objects.bulk_create([
+            PostTag(post_id=post.id, tag_id=tag_id, post_created_at=post.created_at) for tag_id in added
+        ])
+        for tag_id in added:
+            tag_post_count(tag_id).incr()
+    if removed or added:
+        bump_generation('posts')
+
+
+def create_post(title, content, author_id, tags=()):
+    """Create a post and its tags in one transaction"""
+    if not tags:
+        return Post.objects.create(title=title, content=content, author_id=author_id)
+    with transaction.atomic():
+        post = Post.objects.create(title=title, content=content, author_id=author_id)
+        set_post_tags(post, tags, created=True)
+    return post
+
+
+def attach_tags(rows):
+    """Add the tag slugs of each post row (a dict with 'id') as 'tags', in one query"""
+    by_post = {row['id']: row.setdefault('tags', []) for row in rows}
+    if not by_post:
+        return rows
+    pairs = PostTag.objects.filter(post_id__in=list(by_post)).order_by('tag__slug').values_list('post_id', 'tag__slug')
+    for post_id, slug in pairs:
+        by_post[post_id].append(slug)
+    return rows
+
+
+def tag_feed_queryset(tag_id, columns):
+    """
+    values() queryset of the posts with a tag, carrying the feed's sort keys
+    (feed_created_at, feed_post_id) for keyset_page
+    """
+    return Post.objects.filter(tagged__tag_id=tag_id).values(
+        *columns, feed_created_at=F('tagged__post_created_at'), feed_post_id=F('tagged__post_id'),
+    )
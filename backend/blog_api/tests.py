@@ -1,9 +1,48 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import jwt
+from collections import Counter
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Post
+from .async_views import AsyncLoginView, AsyncPostDetailView, AsyncPostListView, AsyncRefreshTokenView
+from .counts import tag_post_count
+from .engagement import counters
+from .hashing import HashingPool, HashingPoolFull
+from .log import queue_handler
+from .management.commands.bench_api import summarize
+from .metrics import registry
+from .middleware import QueryInspectionMiddleware, ReplicaPinMiddleware
+from .models import Post, PostLike, PostTag, RefreshToken, Tag
+from .query_inspection import QueryBudgetExceeded, query_budget
+from .ratelimit import LocalBackend, get_backend, parse_rate
+from .response_cache import bump_generation
+from .routers import health
+from .seeding import generate_posts, seed_posts
+from .tokens import denylist, live_sessions
+from .responses import JsonResponse
+from .user_cache import user_cache
+from .utils import generate_token, verify_token
 
 User = get_user_model()
 
@@ -338,3 +377,1769 @@ class PostModificationTestCase(TestCase):
         
         # Verify post still exists in database
         self.assertTrue(Post.objects.filter(id=self.post.id).exists())
+
+class PostCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post_list_url = reverse('post_list')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.posts = [
+            Post.objects.create(title=f'Post {i}', content='Content', author=self.user)
+            for i in range(5)
+        ]
+    
+    def test_cursor_pages_cover_all_posts_once(self):
+        """Test walking the feed with cursors returns every post newest first"""
+        seen = []
+        cursor = ''
+        while True:
+            response = self.client.get(self.post_list_url, {'cursor': cursor, 'page_size': 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn('total_posts', data)
+            seen.extend(post['id'] for post in data['posts'])
+            if not data['has_next']:
+                break
+            cursor = data['next_cursor']
+        
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+    
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(self.post_list_url, {'cursor': 'not-a-cursor'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.json())
+    
+    def test_page_mode_still_supported(self):
+        """Test page/page_size clients keep getting page metadata"""
+        response = self.client.get(self.post_list_url, {'page': 2, 'page_size': 2})
+        
+        data = response.json()
+        self.assertEqual(data['page'], 2)
+        self.assertEqual(data['pages'], 3)
+        self.assertEqual(data['total_posts'], 5)
+
+class JWTUserCacheTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.post = Post.objects.create(title='Test Post', content='Content', author=self.user)
+        self.post_detail_url = reverse('post_detail', kwargs={'post_id': self.post.id})
+    
+    def auth_header(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    
+    @override_settings(JWT_EMBED_USER_CLAIMS=False)
+    def test_user_lookup_is_cached(self):
+        """Test repeated requests with the same token hit the user cache"""
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        
+        self.assertIsNone(jwt.decode(access_token, options={'verify_signature': False}).get('username'))
+        self.client.delete(self.post_detail_url, **self.auth_header(access_token))
+        with self.assertNumQueries(0):
+            self.assertEqual(verify_token(access_token).pk, self.user.pk)
+        self.assertEqual(user_cache.stats()['misses'], 1)
+        self.assertEqual(user_cache.stats()['hits'], 1)
+    
+    @override_settings(JWT_EMBED_USER_CLAIMS=False)
+    def test_user_save_invalidates_cache(self):
+        """Test saving a user drops the cached entry"""
+        access_token, _ = generate_token(self.user.id)
+        verify_token(access_token)
+        
+        self.user.first_name = 'Changed'
+        self.user.save()
+        
+        self.assertEqual(verify_token(access_token).first_name, 'Changed')
+    
+    def test_embedded_claims_skip_user_lookup(self):
+        """Test tokens with embedded claims authenticate without a user query"""
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        verify_token(access_token)
+        
+        with self.assertNumQueries(0):
+            user = verify_token(access_token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, self.user.username)
+    
+    def test_deactivated_user_tokens_rejected(self):
+        """Test deactivating a user revokes tokens issued before it"""
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        
+        self.user.is_active = False
+        self.user.save()
+        
+        response = self.client.delete(self.post_detail_url, **self.auth_header(access_token))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class PostCountModeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post_list_url = reverse('post_list')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        for i in range(3):
+            Post.objects.create(title=f'Post {i}', content='Content', author=self.user)
+    
+    def test_estimate_count_is_maintained(self):
+        """Test the cached counter follows creates and deletes without recounting"""
+        self.assertEqual(self.client.get(self.post_list_url).json()['total_posts'], 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Another', content='Content', author=self.user)
+            Post.objects.first().delete()
+            Post.objects.create(title='One more', content='Content', author=self.user)
+        
+        # Only the page and tag queries run once the counter is warm
+        with self.assertNumQueries(2):
+            response = self.client.get(self.post_list_url, {'count': 'estimate'})
+        self.assertEqual(response.json()['total_posts'], 4)
+    
+    def test_rolled_back_writes_not_counted(self):
+        """Test creates that roll back leave the cached counter alone"""
+        self.assertEqual(self.client.get(self.post_list_url).json()['total_posts'], 3)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Post.objects.create(title='Another', content='Content', author=self.user)
+                Post.objects.create(title='One more', content='Content', author=self.user)
+                Post.objects.create(title='Broken', content='Content', author_id=None)
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(self.post_list_url, {'count': 'estimate'})
+        self.assertEqual(response.json()['total_posts'], 3)
+    
+    def test_exact_count(self):
+        """Test count=exact always reflects the table"""
+        response = self.client.get(self.post_list_url, {'count': 'exact'})
+        
+        self.assertEqual(response.json()['total_posts'], 3)
+    
+    def test_no_count(self):
+        """Test count=none skips the total and still reports has_next"""
+        response = self.client.get(self.post_list_url, {'count': 'none', 'page_size': 2})
+        
+        data = response.json()
+        self.assertIsNone(data['total_posts'])
+        self.assertIsNone(data['pages'])
+        self.assertEqual(len(data['posts']), 2)
+        self.assertTrue(data['has_next'])
+    
+    def test_invalid_count_mode(self):
+        """Test an unknown count mode is rejected"""
+        response = self.client.get(self.post_list_url, {'count': 'bogus'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PostResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.post = Post.objects.create(title='Test Post', content='Content', author=self.user)
+        self.post_list_url = reverse('post_list')
+        self.post_detail_url = reverse('post_detail', kwargs={'post_id': self.post.id})
+    
+    def test_repeated_reads_served_from_cache(self):
+        """Test a second identical request does not touch the database"""
+        first = self.client.get(self.post_detail_url)
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.post_detail_url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+    
+    def test_if_none_match_returns_304(self):
+        """Test clients revalidating with a current ETag get 304"""
+        etag = self.client.get(self.post_list_url)['ETag']
+        
+        response = self.client.get(self.post_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+    
+    def test_writes_invalidate_cached_responses(self):
+        """Test updating a post expires both list and detail responses"""
+        list_etag = self.client.get(self.post_list_url)['ETag']
+        detail_etag = self.client.get(self.post_detail_url)['ETag']
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        
+        self.client.put(
+            self.post_detail_url,
+            {'title': 'Updated Test Post'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {access_token}'
+        )
+        
+        response = self.client.get(self.post_detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['title'], 'Updated Test Post')
+        response = self.client.get(self.post_list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['posts'][0]['title'], 'Updated Test Post')
+    
+    def test_last_modified_waits_for_second_to_end(self):
+        """Test two writes in one second never share a Last-Modified that If-Modified-Since would match"""
+        clock = mock.Mock(return_value=1000.2)
+        with mock.patch('blog_api.response_cache.time.time', clock):
+            bump_generation('posts', f'post:{self.post.id}')
+            self.assertFalse(self.client.get(self.post_detail_url).has_header('Last-Modified'))
+            
+            clock.return_value = 1001.0
+            last_modified = self.client.get(self.post_detail_url)['Last-Modified']
+            self.assertEqual(
+                self.client.get(self.post_detail_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+                status.HTTP_304_NOT_MODIFIED,
+            )
+            
+            clock.return_value = 1001.4
+            bump_generation(f'post:{self.post.id}')
+            clock.return_value = 1002.0
+            response = self.client.get(self.post_detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.post = Post.objects.create(title='Test Post', content='Content', author=self.user)
+    
+    async def test_async_list_matches_sync_list(self):
+        """Test the async list view returns the same payload as the sync one"""
+        sync_response = await sync_to_async(self.client.get)(reverse('post_list'), {'count': 'exact'})
+        
+        request = self.factory.get(reverse('post_list'), {'count': 'exact'})
+        response = await AsyncPostListView.as_view()(request)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), sync_response.json())
+    
+    async def test_async_detail(self):
+        """Test retrieving a post through the async detail view"""
+        request = self.factory.get(reverse('post_detail', kwargs={'post_id': self.post.id}))
+        response = await AsyncPostDetailView.as_view()(request, post_id=self.post.id)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['author'], self.user.username)
+    
+    async def test_async_login_and_create(self):
+        """Test logging in and creating a post through the async views"""
+        request = self.factory.post(
+            reverse('login'),
+            {'username': 'testuser', 'password': 'testpassword123'},
+            content_type='application/json'
+        )
+        response = await AsyncLoginView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        access_token = json.loads(response.content)['access_token']
+        
+        request = self.factory.post(
+            reverse('post_list'),
+            {'title': 'Async Post', 'content': 'Content'},
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {access_token}'}
+        )
+        response = await AsyncPostListView.as_view()(request)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Post.objects.filter(title='Async Post').aexists())
+    
+    async def test_async_patch_and_delete(self):
+        """Test conditional updates and deletes through the async detail view"""
+        access_token, _ = await sync_to_async(generate_token)(self.user.id, self.user.username)
+        headers = {'Authorization': f'Bearer {access_token}', 'If-Match': '"1"'}
+        url = reverse('post_detail', kwargs={'post_id': self.post.id})
+        
+        request = self.factory.patch(url, {'title': 'Async Title'}, content_type='application/json', headers=headers)
+        response = await AsyncPostDetailView.as_view()(request, post_id=self.post.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2-0-0"')
+        
+        request = self.factory.delete(url, headers=headers)
+        response = await AsyncPostDetailView.as_view()(request, post_id=self.post.id)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(await Post.objects.filter(id=self.post.id).aexists())
+    
+    async def test_async_refresh_token(self):
+        """Test exchanging a refresh token through the async view"""
+        _, refresh_token = await sync_to_async(generate_token)(self.user.id, self.user.username)
+        request = self.factory.post(
+            reverse('refresh_token'),
+            {'refresh_token': refresh_token},
+            content_type='application/json'
+        )
+        response = await AsyncRefreshTokenView.as_view()(request)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access_token', json.loads(response.content))
+
+class PasswordHashingPoolTestCase(TestCase):
+    def setUp(self):
+        self.login_url = reverse('login')
+        self.register_url = reverse('register')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+    
+    def test_pool_rejects_work_beyond_queue_limit(self):
+        """Test a saturated pool raises instead of queueing without bound"""
+        pool = HashingPool(workers=1, queue_limit=0)
+        release = threading.Event()
+        pool.submit(release.wait)
+        
+        with self.assertRaises(HashingPoolFull):
+            pool.submit(release.wait)
+        release.set()
+    
+    def test_login_returns_503_when_pool_full(self):
+        """Test login is shed with 503 and Retry-After when hashing is saturated"""
+        with mock.patch('blog_api.authentication.verify_password', side_effect=HashingPoolFull('busy')):
+            response = self.client.post(
+                self.login_url,
+                {'username': 'testuser', 'password': 'testpassword123'},
+                content_type='application/json'
+            )
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+    
+    def test_register_hashes_password(self):
+        """Test registration stores a usable hash computed on the pool"""
+        response = self.client.post(
+            self.register_url,
+            {'username': 'newuser', 'email': 'new@example.com', 'password': 'newpassword123'},
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(User.objects.get(username='newuser').check_password('newpassword123'))
+    
+    @override_settings(PASSWORD_REHASH_ON_LOGIN=True)
+    def test_login_rehashes_outdated_hash(self):
+        """Test a successful login upgrades a hash made with fewer iterations"""
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode('testpassword123', hasher.salt(), iterations=1000)
+        self.user.save()
+        
+        response = self.client.post(
+            self.login_url,
+            {'username': 'testuser', 'password': 'testpassword123'},
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.user.check_password('testpassword123'))
+
+class PostSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.search_url = reverse('post_search')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.title_match = Post.objects.create(title='Django tips', content='Short post', author=self.user)
+        self.content_match = Post.objects.create(title='Other', content='Notes about django', author=self.user)
+        Post.objects.create(title='Unrelated', content='Nothing to see', author=self.user)
+    
+    def test_title_matches_rank_first(self):
+        """Test matches in the title outrank matches in the content"""
+        response = self.client.get(self.search_url, {'q': 'django'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post['id'] for post in response.json()['posts']]
+        self.assertEqual(ids, [self.title_match.id, self.content_match.id])
+    
+    def test_search_cursor_paging(self):
+        """Test paging through results with the returned cursor"""
+        first = self.client.get(self.search_url, {'q': 'django', 'page_size': 1}).json()
+        second = self.client.get(self.search_url, {'q': 'django', 'page_size': 1, 'cursor': first['next_cursor']}).json()
+        
+        self.assertEqual(first['posts'][0]['id'], self.title_match.id)
+        self.assertEqual(second['posts'][0]['id'], self.content_match.id)
+        self.assertFalse(second['has_next'])
+    
+    def test_search_sees_updates(self):
+        """Test the search index follows edits to a post"""
+        self.title_match.title = 'Flask tips'
+        self.title_match.save()
+        
+        ids = [post['id'] for post in self.client.get(self.search_url, {'q': 'django'}).json()['posts']]
+        self.assertEqual(ids, [self.content_match.id])
+    
+    def test_search_requires_query(self):
+        """Test a missing query is rejected"""
+        response = self.client.get(self.search_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_unsupported_database(self):
+        """Test search on a database without a full-text implementation is a 501, not a crash"""
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            response = self.client.get(self.search_url, {'q': 'django'})
+        
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertIn('mysql', response.json()['error'])
+
+class PostBulkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bulk_url = reverse('post_bulk')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other_user = User.objects.create_user(username='otheruser', password='otherpassword123')
+        self.post = Post.objects.create(title='Mine', content='Content', author=self.user)
+        self.doomed = Post.objects.create(title='Delete me', content='Content', author=self.user)
+        self.other_post = Post.objects.create(title='Theirs', content='Content', author=self.other_user)
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access_token}'}
+        # Check the session up front; jwt_required repeats it only once per interval
+        verify_token(access_token)
+    
+    def bulk(self, operations):
+        return self.client.post(self.bulk_url, {'operations': operations}, content_type='application/json', **self.auth)
+    
+    def test_mixed_batch_reports_per_item_results(self):
+        """Test a batch applies valid operations and reports failures per item"""
+        response = self.bulk([
+            {'op': 'create', 'title': 'New 1', 'content': 'Content'},
+            {'op': 'create', 'title': 'New 2', 'content': 'Content'},
+            {'op': 'update', 'id': self.post.id, 'title': 'Mine, updated'},
+            {'op': 'delete', 'id': self.doomed.id},
+            {'op': 'update', 'id': self.other_post.id, 'title': 'Hijacked'},
+            {'op': 'delete', 'id': 9999},
+            {'op': 'create', 'title': 'No content'},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, [201, 201, 200, 200, 403, 404, 400])
+        self.assertEqual(Post.objects.filter(title__startswith='New').count(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Mine, updated')
+        self.assertFalse(Post.objects.filter(id=self.doomed.id).exists())
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.title, 'Theirs')
+    
+    def test_bulk_query_count_does_not_grow_with_batch(self):
+        """Test a batch of creates and updates runs a fixed number of queries"""
+        operations = [{'op': 'create', 'title': f'New {i}', 'content': 'Content'} for i in range(50)]
+        operations.append({'op': 'update', 'id': self.post.id, 'content': 'Changed'})
+        
+        # ownership lookup, savepoint, INSERT, UPDATE, release savepoint
+        with self.assertNumQueries(5):
+            response = self.bulk(operations)
+        self.assertEqual(len(response.json()['results']), 51)
+    
+    def test_bulk_create_updates_listing(self):
+        """Test bulk creates are reflected in cached listings and totals"""
+        self.client.get(reverse('post_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk([{'op': 'create', 'title': 'Fresh', 'content': 'Content'}])
+        
+        data = self.client.get(reverse('post_list')).json()
+        self.assertEqual(data['total_posts'], 4)
+        self.assertEqual(data['posts'][0]['title'], 'Fresh')
+    
+    def test_malformed_fields_rejected_per_item(self):
+        """Test non-string, empty or overlong fields fail their own item without aborting the batch"""
+        response = self.bulk([
+            {'op': 'create', 'title': {'a': 1}, 'content': 'Content'},
+            {'op': 'create', 'title': 'x' * 201, 'content': 'Content'},
+            {'op': 'update', 'id': self.post.id, 'content': ['list']},
+            {'op': 'update', 'id': self.doomed.id, 'title': ''},
+            {'op': 'create', 'title': 'Fine', 'content': 'Content'},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [400, 400, 400, 400, 201])
+        self.assertEqual(results[1]['error'], 'title must be at most 200 characters')
+        self.assertEqual(Post.objects.count(), 4)
+    
+    def test_bulk_tags_applied(self):
+        """Test tags on bulk creates and updates are applied, and invalid ones fail their item"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk([
+                {'op': 'create', 'title': 'Tagged', 'content': 'Content', 'tags': ['django', 'web']},
+                {'op': 'update', 'id': self.post.id, 'tags': ['django']},
+                {'op': 'update', 'id': self.doomed.id, 'tags': 'django'},
+            ])
+        
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 400])
+        tags = PostTag.objects.order_by('post_id', 'tag__slug').values_list('post_id', 'tag__slug', 'post_created_at')
+        self.assertEqual(list(tags), [
+            (self.post.id, 'django', self.post.created_at),
+            (results[0]['id'], 'django', Post.objects.get(id=results[0]['id']).created_at),
+            (results[0]['id'], 'web', Post.objects.get(id=results[0]['id']).created_at),
+        ])
+        self.assertEqual(tag_post_count(Tag.objects.get(slug='django').id).get(), 2)
+        self.assertEqual(Post.objects.get(id=self.post.id).version, 2)
+    
+    def test_unknown_fields_rejected_per_item(self):
+        """Test keys an operation does not accept fail their own item instead of being dropped"""
+        response = self.bulk([
+            {'op': 'create', 'title': 'New', 'content': 'Content', 'author': 'someone'},
+            {'op': 'delete', 'id': self.doomed.id, 'tags': []},
+        ])
+        
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [400, 400])
+        self.assertEqual(results[0]['error'], 'Unknown fields for create: author')
+        self.assertTrue(Post.objects.filter(id=self.doomed.id).exists())
+    
+    def test_update_of_concurrently_deleted_post(self):
+        """Test an update whose post disappears after the ownership check is reported as 404"""
+        bulk_update = Post.objects.bulk_update
+        
+        def delete_first(objs, fields, **kwargs):
+            Post.objects.filter(id=self.doomed.id).delete()
+            return bulk_update(objs, fields, **kwargs)
+        
+        with mock.patch.object(Post.objects, 'bulk_update', delete_first):
+            response = self.bulk([
+                {'op': 'update', 'id': self.post.id, 'title': 'Kept'},
+                {'op': 'update', 'id': self.doomed.id, 'title': 'Gone'},
+            ])
+        
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 404])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Kept')
+    
+    def test_bulk_requires_authentication(self):
+        """Test the bulk endpoint rejects anonymous requests"""
+        response = self.client.post(self.bulk_url, {'operations': []}, content_type='application/json')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_bulk_rejects_empty_batch(self):
+        """Test an empty operation list is rejected"""
+        response = self.bulk([])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PostExportTestCase(TestCase):
+    def setUp(self):
+        self.export_url = reverse('post_export')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other_user = User.objects.create_user(username='otheruser', password='otherpassword123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Content', author=self.user) for i in range(3)]
+        Post.objects.create(title='Theirs', content='Content', author=self.other_user)
+    
+    def export(self, params=None, **extra):
+        response = self.client.get(self.export_url, params or {}, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def test_export_streams_ndjson(self):
+        """Test every post is exported as one JSON object per line, oldest first"""
+        response, body = self.export()
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['id'], self.posts[0].id)
+    
+    def test_export_filters(self):
+        """Test filtering the export by author and created_at range"""
+        since = self.posts[1].created_at.isoformat()
+        _, body = self.export({'author': 'testuser', 'since': since})
+        
+        ids = [json.loads(line)['id'] for line in body.decode().splitlines()]
+        self.assertEqual(ids, [self.posts[1].id, self.posts[2].id])
+    
+    def test_export_gzip(self):
+        """Test the export is gzip encoded when the client accepts it"""
+        response, body = self.export(HTTP_ACCEPT_ENCODING='gzip')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(gzip.decompress(body).decode().splitlines()), 4)
+    
+    def test_export_invalid_datetime(self):
+        """Test an unparseable since/until is rejected"""
+        response = self.client.get(self.export_url, {'since': 'yesterday'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class JsonResponseTestCase(TestCase):
+    def test_fast_and_fallback_encoders_agree(self):
+        """Test orjson and the stdlib fallback produce the same document"""
+        created_at = datetime.datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc)
+        data = {'posts': [{'id': 1, 'title': 'Post', 'created_at': created_at}]}
+        
+        fast = json.loads(JsonResponse(data).content)
+        with mock.patch('blog_api.responses.orjson', None):
+            fallback = json.loads(JsonResponse(data).content)
+        
+        self.assertEqual(fast, fallback)
+        self.assertEqual(fast['posts'][0]['created_at'], '2025-01-02T03:04:05.123456Z')
+    
+    def test_non_dict_requires_safe_false(self):
+        """Test non-dict payloads need safe=False like Django's JsonResponse"""
+        with self.assertRaises(TypeError):
+            JsonResponse([1, 2])
+        self.assertEqual(json.loads(JsonResponse([1, 2], safe=False).content), [1, 2])
+
+class PostFieldSelectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post_list_url = reverse('post_list')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.long_content = 'word ' * 500
+        self.post = Post.objects.create(title='Long post', content=self.long_content, author=self.user)
+    
+    def test_excerpt_maintained_on_save(self):
+        """Test the stored excerpt is a bounded summary that follows edits"""
+        self.assertLessEqual(len(self.post.excerpt), 280)
+        self.assertTrue(self.post.excerpt.endswith('…'))
+        
+        self.post.content = 'Now short'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, 'Now short')
+    
+    def test_excerpt_view_omits_content(self):
+        """Test view=excerpt returns the excerpt and never selects the content column"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.post_list_url, {'view': 'excerpt', 'count': 'none'})
+        
+        post = response.json()['posts'][0]
+        self.assertNotIn('content', post)
+        self.assertEqual(post['excerpt'], self.post.excerpt)
+        self.assertFalse(any('"content"' in query['sql'] for query in queries))
+    
+    def test_sparse_fieldset_with_cursor(self):
+        """Test fields= returns only the requested keys, also in cursor mode"""
+        Post.objects.create(title='Second', content='Content', author=self.user)
+        
+        response = self.client.get(self.post_list_url, {'fields': 'title', 'cursor': '', 'page_size': 1})
+        
+        data = response.json()
+        self.assertEqual(data['posts'], [{'title': 'Second'}])
+        self.assertTrue(data['has_next'])
+    
+    def test_unknown_field_rejected(self):
+        """Test selecting a field that is not exposed is rejected"""
+        response = self.client.get(self.post_list_url, {'fields': 'title,author__password'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class AuthorPostListTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other_user = User.objects.create_user(username='otheruser', password='otherpassword123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Content', author=self.user) for i in range(3)]
+        Post.objects.create(title='Theirs', content='Content', author=self.other_user)
+        self.author_url = reverse('author_post_list', kwargs={'username': 'testuser'})
+    
+    def test_author_feed_pages_only_their_posts(self):
+        """Test the author feed walks that author's posts newest first"""
+        first = self.client.get(self.author_url, {'page_size': 2}).json()
+        second = self.client.get(self.author_url, {'page_size': 2, 'cursor': first['next_cursor']}).json()
+        
+        ids = [post['id'] for post in first['posts'] + second['posts']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        self.assertEqual(first['total_posts'], 3)
+        self.assertFalse(second['has_next'])
+    
+    def test_author_count_follows_writes(self):
+        """Test the cached per-author count tracks creates and deletes"""
+        self.client.get(self.author_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='New', content='Content', author=self.user)
+            self.posts[0].delete()
+            Post.objects.create(title='Another', content='Content', author=self.user)
+        
+        self.assertEqual(self.client.get(self.author_url).json()['total_posts'], 4)
+    
+    def test_unknown_author(self):
+        """Test the feed of a missing user is a 404"""
+        response = self.client.get(reverse('author_post_list', kwargs={'username': 'nobody'}))
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        Post.objects.create(title='Post', content='Content', author=self.user)
+        self.metrics_url = reverse('metrics')
+    
+    def test_request_recorded_per_route(self):
+        """Test requests are recorded under the URL name, not the raw path"""
+        self.client.get(reverse('post_list'))
+        
+        response = self.client.get(self.metrics_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_ms_count{route="post_list",method="GET",status="200"} 1', body)
+        self.assertIn('http_response_size_bytes_count{route="post_list",method="GET",status="200"} 1', body)
+    
+    @override_settings(METRICS_DB_SAMPLE_RATE=1.0)
+    def test_sampled_requests_count_queries(self):
+        """Test sampled requests record their query count"""
+        self.client.get(reverse('post_list'), {'count': 'exact'})
+        
+        body = self.client.get(self.metrics_url).content.decode()
+        
+        self.assertIn('db_queries_per_request_count{route="post_list",method="GET"} 1', body)
+        self.assertNotIn('db_queries_per_request_bucket{route="post_list",method="GET",le="0"} 1', body)
+    
+    @override_settings(METRICS_DB_SAMPLE_RATE=0)
+    def test_unsampled_requests_skip_queries(self):
+        """Test query metrics are not recorded when sampling is off"""
+        self.client.get(reverse('post_list'))
+        
+        body = self.client.get(self.metrics_url).content.decode()
+        
+        self.assertNotIn('db_queries_per_request_count{route="post_list"', body)
+    
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token_required(self):
+        """Test scrapes need the bearer token when METRICS_TOKEN is set"""
+        self.assertEqual(self.client.get(self.metrics_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        for header in ('Bearer secreT', 'Bearer s\xe9cret'):
+            response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION=header)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer secret')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class QueryBudgetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Content', author=self.user) for i in range(15)]
+        self.token = generate_token(self.user.id, self.user.username)[0]
+        # Check the session up front; jwt_required repeats it only once per interval
+        verify_token(self.token)
+        self.detail_url = reverse('post_detail', kwargs={'post_id': self.posts[0].id})
+    
+    def test_post_list_budget(self):
+        """Test a list page costs one count, one page and one tag query, however many rows"""
+        with query_budget(3):
+            self.client.get(reverse('post_list'), {'page_size': 10})
+        with query_budget(2):
+            self.client.get(reverse('post_list'), {'cursor': ''})
+    
+    def test_post_detail_budget(self):
+        """Test reading a post is a single query"""
+        with query_budget(1):
+            self.client.get(self.detail_url)
+    
+    def test_post_write_budget(self):
+        """Test creating and updating a post do not load the author"""
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+        with query_budget(1):
+            self.client.post(reverse('post_list'), {'title': 'New', 'content': 'Content'}, content_type='application/json', **auth)
+        with query_budget(1):
+            self.client.put(self.detail_url, {'title': 'Updated'}, content_type='application/json', **auth)
+    
+    def test_author_feed_budget(self):
+        """Test the author feed costs the user lookup, its count, one page and one tag query"""
+        with query_budget(4):
+            self.client.get(reverse('author_post_list', kwargs={'username': 'testuser'}))
+    
+    def test_budget_exceeded(self):
+        """Test exceeding the budget fails with the queries listed"""
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(1):
+                for post in Post.objects.all()[:2]:
+                    post.author.username
+        
+        self.assertIn('3 queries executed, budget is 1', str(raised.exception))
+        self.assertIn('blog_api_user', str(raised.exception))
+
+class QueryInspectionMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        for i in range(3):
+            author = User.objects.create_user(username=f'author{i}', password='testpassword123')
+            Post.objects.create(title=f'Post {i}', content='Content', author=author)
+        self.request = RequestFactory().get('/api/posts/')
+    
+    def run_middleware(self, view):
+        def get_response(request):
+            view()
+            return JsonResponse({})
+        with self.assertLogs('blog_api.middleware', level='WARNING') as logs:
+            QueryInspectionMiddleware(get_response)(self.request)
+        return '\n'.join(logs.output)
+    
+    @override_settings(QUERY_INSPECTION=True)
+    def test_n_plus_one_reported_with_origin(self):
+        """Test a per-row related lookup is reported with the line issuing it"""
+        def view():
+            return [post.author.username for post in Post.objects.all()]
+        
+        output = self.run_middleware(view)
+        
+        self.assertIn('Possible N+1 on GET /api/posts/: ran 3 times', output)
+        self.assertIn('blog_api/tests.py', output)
+    
+    @override_settings(QUERY_INSPECTION=True)
+    def test_duplicate_query_reported(self):
+        """Test the same query with the same parameters is reported as a duplicate"""
+        def view():
+            for _ in range(3):
+                User.objects.filter(username='testuser').exists()
+        
+        self.assertIn('Duplicate query', self.run_middleware(view))
+    
+    @override_settings(QUERY_INSPECTION=True, QUERY_INSPECTION_SLOW_MS=0)
+    def test_slow_query_reported(self):
+        """Test queries over the threshold are reported"""
+        self.assertIn('Slow query on GET /api/posts/', self.run_middleware(lambda: Post.objects.count()))
+    
+    @override_settings(QUERY_INSPECTION=False)
+    def test_disabled(self):
+        """Test the middleware removes itself when inspection is off"""
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInspectionMiddleware(lambda request: None)
+
+
+class BenchApiTestCase(TestCase):
+    def test_summary_percentiles(self):
+        """Test the report uses nearest-rank percentiles and counts error statuses"""
+        latencies = [float(ms) for ms in range(100, 0, -1)]
+        
+        summary = summarize(latencies, Counter({200: 98, 401: 1, 599: 1}), 2.0)
+        
+        self.assertEqual(summary['latency_ms']['p50'], 50)
+        self.assertEqual(summary['latency_ms']['p95'], 95)
+        self.assertEqual(summary['latency_ms']['p99'], 99)
+        self.assertEqual(summary['throughput_rps'], 50)
+        self.assertEqual(summary['errors'], 2)
+    
+    def test_unknown_scenario_rejected(self):
+        """Test unknown scenarios fail before anything is seeded"""
+        with self.assertRaises(CommandError):
+            call_command('bench_api', scenarios='list,explode')
+        
+        self.assertFalse(User.objects.filter(username__startswith='bench').exists())
+
+
+class SeedBlogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def test_seed_creates_users_and_posts(self):
+        """Test seeding creates the rows with excerpts and spread out dates"""
+        out = StringIO()
+        call_command('seed_blog', users=3, posts=25, seed=1, stdout=out)
+        
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 3)
+        self.assertEqual(Post.objects.count(), 25)
+        self.assertFalse(Post.objects.filter(excerpt='').exists())
+        self.assertGreater(Post.objects.values('created_at').distinct().count(), 1)
+        self.assertIn('rows/s', out.getvalue())
+        self.assertTrue(self.client.login(username='user0', password='password123'))
+    
+    def test_seed_keeps_generated_timestamps(self):
+        """Test seeded posts keep their generated dates without switching off the model's auto_now"""
+        rows = list(generate_posts([User.objects.create_user(username='author').id], 5, seed=7))
+        
+        with mock.patch('blog_api.seeding.generate_posts', return_value=iter(rows)):
+            seed_posts([rows[0][3]], 5, method='bulk')
+        
+        stored = sorted(Post.objects.values_list('created_at', 'updated_at'))
+        self.assertEqual(stored, sorted((row[4], row[4]) for row in rows))
+        self.assertTrue(Post._meta.get_field('created_at').auto_now_add)
+        self.assertTrue(Post._meta.get_field('updated_at').auto_now)
+    
+    def test_seed_resets_cached_counts(self):
+        """Test cached totals account for rows inserted without signals"""
+        self.client.get(reverse('post_list'))
+        
+        call_command('seed_blog', users=2, posts=10, stdout=StringIO())
+        
+        self.assertEqual(self.client.get(reverse('post_list')).json()['total_posts'], 10)
+    
+    def test_same_seed_same_data(self):
+        """Test the generated rows, dates included, are deterministic by seed"""
+        first = list(generate_posts([1, 2, 3], 5, seed=42))
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + datetime.timedelta(days=30)):
+            second = list(generate_posts([1, 2, 3], 5, seed=42))
+        other = list(generate_posts([1, 2, 3], 5, seed=43))
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+    
+    def test_seed_dates_end_at_until(self):
+        """Test --until moves the window the post dates are spread over"""
+        call_command('seed_blog', '--until', '2024-06-01', users=1, posts=20, days=10, stdout=StringIO())
+        
+        until = datetime.datetime(2024, 6, 1, tzinfo=datetime.timezone.utc)
+        dates = Post.objects.values_list('created_at', flat=True)
+        self.assertTrue(all(until - datetime.timedelta(days=10) <= date <= until for date in dates))
+    
+    def test_copy_requires_postgres(self):
+        """Test --method copy is refused on other databases"""
+        if connection.vendor == 'postgresql':
+            self.skipTest('COPY is available')
+        with self.assertRaises(CommandError):
+            call_command('seed_blog', users=1, posts=1, method='copy', stdout=StringIO())
+
+
+class EmailLoginTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='Test.User@Example.com', password='testpassword123')
+        self.login_url = reverse('login')
+    
+    def login(self, username, password='testpassword123'):
+        return self.client.post(self.login_url, {'username': username, 'password': password}, content_type='application/json')
+    
+    def test_login_with_email_any_case(self):
+        """Test email logins match case-insensitively"""
+        response = self.login('test.user@example.com')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['username'], 'testuser')
+    
+    async def test_async_login_with_email(self):
+        """Test the async login view accepts emails and hashes for unknown accounts too"""
+        factory = AsyncRequestFactory()
+        request = factory.post(
+            self.login_url, {'username': 'TEST.user@example.com', 'password': 'testpassword123'},
+            content_type='application/json'
+        )
+        response = await AsyncLoginView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['user']['username'], 'testuser')
+        
+        request = factory.post(
+            self.login_url, {'username': 'nobody@example.com', 'password': 'testpassword123'},
+            content_type='application/json'
+        )
+        with mock.patch('blog_api.authentication.hash_password') as hash_password:
+            response = await AsyncLoginView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        hash_password.assert_called_once_with('testpassword123')
+    
+    def test_login_is_one_query(self):
+        """Test username and email logins each look the user up with a single query"""
+        for username in ('testuser', 'TEST.USER@example.com'):
+            # The lookup, then recording the refresh token
+            with self.assertNumQueries(2):
+                self.assertEqual(self.login(username).status_code, status.HTTP_200_OK)
+    
+    def test_email_lookup_uses_functional_index_expression(self):
+        """Test the email probe filters on LOWER(email) with the index condition"""
+        with CaptureQueriesContext(connection) as queries:
+            self.login('test.user@example.com')
+        
+        sql = queries.captured_queries[0]['sql'].upper()
+        self.assertIn('LOWER("BLOG_API_USER"."EMAIL")', sql)
+        self.assertIn('NOT ("BLOG_API_USER"."EMAIL" = \'\'', sql)
+    
+    def test_unknown_user_still_hashes(self):
+        """Test a login for a missing account spends a hash like a wrong password does"""
+        with mock.patch('blog_api.authentication.hash_password') as hash_password:
+            response = self.login('nobody@example.com')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        hash_password.assert_called_once_with('testpassword123')
+    
+    def test_username_containing_at_sign(self):
+        """Test an exact username match wins over another user's email"""
+        User.objects.create_user(username='test.user@example.com', password='otherpassword123')
+        
+        response = self.login('test.user@example.com', 'otherpassword123')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['username'], 'test.user@example.com')
+    
+    def test_email_unique_case_insensitive(self):
+        """Test emails are unique regardless of case while blank emails may repeat"""
+        User.objects.create_user(username='noemail1', password='testpassword123')
+        User.objects.create_user(username='noemail2', password='testpassword123')
+        
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='other', email='TEST.USER@example.com', password='testpassword123')
+    
+    def test_register_duplicate_email(self):
+        """Test registration rejects an email already in use"""
+        response = self.client.post(reverse('register'), {
+            'username': 'newuser',
+            'email': 'test.user@EXAMPLE.com',
+            'password': 'newpassword123',
+        }, content_type='application/json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['error'], 'Email already exists')
+
+
+class EmailConstraintMigrationTestCase(TransactionTestCase):
+    before = [('blog_api', '0005_post_author_created_id_idx')]
+    after = [('blog_api', '0006_user_email_ci_unique')]
+    
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+    
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+    
+    def test_duplicate_emails_blanked(self):
+        """Test the migration keeps each email on its oldest account and blanks later case variants"""
+        OldUser = self.migrate(self.before).get_model('blog_api', 'User')
+        first = OldUser.objects.create(username='first', email='Same@Example.com')
+        second = OldUser.objects.create(username='second', email='same@example.com')
+        third = OldUser.objects.create(username='third', email='SAME@example.com')
+        other = OldUser.objects.create(username='other', email='other@example.com')
+        
+        NewUser = self.migrate(self.after).get_model('blog_api', 'User')
+        
+        emails = dict(NewUser.objects.values_list('id', 'email'))
+        self.assertEqual(
+            [emails[user.id] for user in (first, second, third, other)],
+            ['Same@Example.com', '', '', 'other@example.com'],
+        )
+
+
+class RefreshTokenRotationTestCase(TestCase):
+    def setUp(self):
+        denylist.clear()
+        live_sessions.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.access_token, self.refresh_token = generate_token(self.user.id, self.user.username)
+        self.refresh_url = reverse('refresh_token')
+        self.logout_url = reverse('logout')
+        self.post_list_url = reverse('post_list')
+    
+    def refresh(self, token):
+        return self.client.post(self.refresh_url, {'refresh_token': token}, content_type='application/json')
+    
+    def create_post(self, access_token):
+        return self.client.post(self.post_list_url, {'title': 'Title', 'content': 'Content'},
+                                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+    
+    def test_refresh_rotates_token(self):
+        """Test refreshing spends the presented token and records its successor"""
+        response = self.refresh(self.refresh_token)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_refresh_token = response.json()['refresh_token']
+        self.assertNotEqual(new_refresh_token, self.refresh_token)
+        old, new = RefreshToken.objects.order_by('id')
+        self.assertIsNotNone(old.revoked_at)
+        self.assertEqual(old.replaced_by, new.jti)
+        self.assertEqual(old.family, new.family)
+        self.assertEqual(self.refresh(new_refresh_token).status_code, status.HTTP_200_OK)
+    
+    def test_reuse_revokes_session(self):
+        """Test replaying a rotated token revokes the whole session, access tokens included"""
+        rotated = self.refresh(self.refresh_token).json()
+        
+        self.assertEqual(self.refresh(self.refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.assertEqual(self.refresh(rotated['refresh_token']).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.create_post(rotated['access_token']).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(RefreshToken.objects.filter(revoked_at__isnull=True).exists())
+    
+    def test_other_sessions_unaffected(self):
+        """Test revoking one session leaves the user's other logins working"""
+        other_access, other_refresh = generate_token(self.user.id, self.user.username)
+        self.client.post(self.logout_url, HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        
+        self.assertEqual(self.create_post(other_access).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.refresh(other_refresh).status_code, status.HTTP_200_OK)
+    
+    def test_logout_with_access_token(self):
+        """Test logging out revokes the session's refresh and access tokens"""
+        response = self.client.post(self.logout_url, HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(self.refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.create_post(self.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_with_refresh_token(self):
+        """Test logging out with the refresh token in the body"""
+        self.client.post(self.logout_url, {'refresh_token': self.refresh_token}, content_type='application/json')
+        
+        self.assertIsNotNone(RefreshToken.objects.get().revoked_at)
+        self.assertEqual(self.refresh(self.refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_refresh_token_rejected_as_access_token(self):
+        """Test a refresh token is not accepted as a bearer token, even once this process forgot the logout"""
+        self.assertEqual(self.create_post(self.refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.client.post(self.logout_url, {'refresh_token': self.refresh_token}, content_type='application/json')
+        denylist.clear()
+        
+        self.assertEqual(self.create_post(self.refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.create_post(self.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_on_another_worker(self):
+        """Test a session revoked in the database is rejected once its live check expires"""
+        self.assertEqual(self.create_post(self.access_token).status_code, status.HTTP_201_CREATED)
+        
+        # What another worker's logout leaves behind: a revoked row, and nothing in this process
+        RefreshToken.objects.update(revoked_at=timezone.now())
+        live_sessions.clear()
+        
+        self.assertEqual(self.create_post(self.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_untracked_token_rejected(self):
+        """Test refresh tokens without a recorded jti are refused"""
+        legacy = jwt.encode({
+            'user_id': self.user.id,
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1),
+            'iat': datetime.datetime.utcnow(),
+        }, settings.SECRET_KEY, algorithm='HS256')
+        
+        self.assertEqual(self.refresh(legacy).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_access_token_check_needs_no_query(self):
+        """Test verifying an access token checks its session once per interval and otherwise stays off the database"""
+        with self.assertNumQueries(1):
+            self.assertEqual(verify_token(self.access_token).id, self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(verify_token(self.access_token).id, self.user.id)
+    
+    def test_prune_deletes_expired_rows(self):
+        """Test pruning removes only expired refresh tokens"""
+        RefreshToken.objects.create(jti='expired', family=RefreshToken.objects.get().family, user=self.user,
+                                    expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        
+        call_command('prune_refresh_tokens', stdout=StringIO())
+        
+        self.assertEqual(RefreshToken.objects.count(), 1)
+        self.assertFalse(RefreshToken.objects.filter(jti='expired').exists())
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='local', RATE_LIMITS={
+    'login': {'ip': '2/m'},
+    'post_create': {'user': '1/m'},
+})
+class RateLimitTestCase(TestCase):
+    def setUp(self):
+        get_backend().clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.login_url = reverse('login')
+    
+    def login(self, **extra):
+        return self.client.post(self.login_url, {'username': 'testuser', 'password': 'wrong'},
+                                content_type='application/json', **extra)
+    
+    def test_login_limited_per_ip(self):
+        """Test logins beyond the bucket get 429 with Retry-After, without hashing"""
+        self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        with mock.patch('blog_api.authentication.verify_password') as verify_password:
+            response = self.login()
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # One token every 30 seconds, less the time the failed logins took
+        self.assertIn(int(response['Retry-After']), range(1, 31))
+        verify_password.assert_not_called()
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_post_create_limited_per_user(self):
+        """Test post creation is limited per authenticated user"""
+        token = generate_token(self.user.id, self.user.username)[0]
+        other = User.objects.create_user(username='otheruser', password='otherpassword123')
+        other_token = generate_token(other.id, other.username)[0]
+        
+        def create(access_token):
+            return self.client.post(reverse('post_list'), {'title': 'Title', 'content': 'Content'},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        
+        self.assertEqual(create(token).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(create(token).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(create(other_token).status_code, status.HTTP_201_CREATED)
+    
+    def test_bucket_refills(self):
+        """Test tokens come back at the configured rate"""
+        backend = LocalBackend()
+        with mock.patch('blog_api.ratelimit.time.monotonic', side_effect=[0, 0, 0.5, 1.0]):
+            self.assertEqual(backend.hit('key', 2, 2), 0)
+            self.assertEqual(backend.hit('key', 2, 2), 0)
+            self.assertAlmostEqual(backend.hit('key', 2, 2), 0.5)
+            self.assertEqual(backend.hit('key', 2, 2), 0)
+    
+    @override_settings(RATE_LIMIT_BACKEND='cache')
+    def test_cache_backend(self):
+        """Test the shared cache backend enforces the same limits"""
+        cache.clear()
+        self.login()
+        self.login()
+        
+        response = self.login()
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+    
+    def test_parse_rate(self):
+        """Test rate strings with and without a period multiplier"""
+        self.assertEqual(parse_rate('10/m'), (10, 60.0))
+        self.assertEqual(parse_rate('100/5m'), (100, 300.0))
+        with self.assertRaises(ValueError):
+            parse_rate('ten per minute')
+
+
+class DatabaseMetricsTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+    
+    def test_connection_setups_counted(self):
+        """Test every connection setup is counted per database"""
+        connection_created.send(sender=connection.__class__, connection=connection)
+        connection_created.send(sender=connection.__class__, connection=connection)
+        
+        self.assertIn('db_connections_opened_total{database="default"} 2', registry.render())
+    
+    def test_pool_stats_exposed(self):
+        """Test psycopg_pool statistics are rendered as gauges and counters"""
+        pooled = mock.Mock()
+        pooled.pool.get_stats.return_value = {
+            'pool_size': 8, 'pool_available': 3, 'requests_waiting': 2,
+            'requests_num': 120, 'requests_wait_ms': 450, 'connections_num': 9,
+        }
+        with mock.patch('blog_api.metrics._pooled_connections', return_value=[('default', pooled)]):
+            body = registry.render()
+        
+        self.assertIn('db_pool_in_use{database="default"} 5', body)
+        self.assertIn('db_pool_waiting{database="default"} 2', body)
+        self.assertIn('db_pool_checkout_wait_ms_total{database="default"} 450', body)
+        self.assertIn('db_pool_timeouts_total{database="default"} 0', body)
+    
+    def test_no_pool_series_without_pool(self):
+        """Test pool metrics are absent when no database is pooled"""
+        self.assertNotIn('db_pool_in_use{', registry.render())
+
+
+class PostConditionalWriteTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpassword123')
+        self.post = Post.objects.create(title='Test Post', content='Original content', author=self.user)
+        self.detail_url = reverse('post_detail', kwargs={'post_id': self.post.id})
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access_token}'}
+        # Check the session up front; jwt_required repeats it only once per interval
+        verify_token(access_token)
+    
+    def patch(self, data, **extra):
+        return self.client.patch(self.detail_url, data, content_type='application/json', **self.auth, **extra)
+    
+    def test_patch_is_one_statement(self):
+        """Test a partial update is a single UPDATE that keeps omitted fields"""
+        with self.assertNumQueries(1):
+            response = self.patch({'content': 'New content'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['title'], 'Test Post')
+        self.assertEqual(data['content'], 'New content')
+        self.assertEqual(data['version'], 2)
+        self.assertEqual(response['ETag'], '"2-0-0"')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, 'New content')
+        self.assertGreater(self.post.updated_at, self.post.created_at)
+    
+    def test_detail_etag_is_version(self):
+        """Test the detail ETag names the row version and counters, revalidates with 304 and serves If-Match"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['ETag'], '"1-0-0"')
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH='"1-0-0"')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        response = self.patch({'title': 'Changed'}, HTTP_IF_MATCH='"1-0-0"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"2-0-0"')
+    
+    def test_if_match_stale_version(self):
+        """Test a write with a stale If-Match is rejected with 412 and changes nothing"""
+        self.assertEqual(self.patch({'title': 'First'}, HTTP_IF_MATCH='"1"').status_code, status.HTTP_200_OK)
+        
+        response = self.patch({'title': 'Second'}, HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(self.detail_url, HTTP_IF_MATCH='"1"', **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('First', 2))
+    
+    def test_if_match_unparseable(self):
+        """Test an If-Match that cannot name a version never matches"""
+        response = self.patch({'title': 'Changed'}, HTTP_IF_MATCH='"abc"')
+        
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+    
+    def test_rejections(self):
+        """Test missing posts, other authors' posts and empty updates are told apart"""
+        response = self.client.patch(
+            reverse('post_detail', kwargs={'post_id': self.post.id + 100}),
+            {'title': 'Changed'}, content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.patch({}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.patch({'title': ''}).status_code, status.HTTP_400_BAD_REQUEST)
+        
+        access_token, _ = generate_token(self.other_user.id, self.other_user.username)
+        response = self.client.delete(self.detail_url, HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_delete_is_one_statement(self):
+        """Test deleting keeps the cached counts without loading the row"""
+        self.assertEqual(self.client.get(reverse('post_list')).json()['total_posts'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(self.detail_url, HTTP_IF_MATCH='"1"', **self.auth)
+        
+        # One DELETE each for the post's likes, its tags and the post, inside a savepoint
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(all(sql.startswith('DELETE') for sql in statements))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Post.objects.filter(id=self.post.id).exists())
+        self.assertEqual(self.client.get(reverse('post_list')).json()['total_posts'], 0)
+        self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_writes_without_returning(self):
+        """Test updates and deletes on databases without RETURNING (e.g. SQLite before 3.35)"""
+        PostTag.objects.create(post=self.post, tag=Tag.objects.create(slug='django', name='django'),
+                               post_created_at=self.post.created_at)
+        
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.patch({'content': 'New content'}, HTTP_IF_MATCH='"1"')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual((response.json()['content'], response.json()['version']), ('New content', 2))
+            
+            response = self.client.delete(self.detail_url, HTTP_IF_MATCH='"2"', **self.auth)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Post.objects.filter(id=self.post.id).exists())
+        self.assertFalse(PostTag.objects.exists())
+        self.assertFalse(any('RETURNING' in query['sql'] for query in queries))
+    
+    def test_other_writes_bump_version(self):
+        """Test saves and bulk updates also move the version on"""
+        self.post.title = 'Saved'
+        self.post.save(update_fields=['title'])
+        self.client.post(
+            reverse('post_bulk'), {'operations': [{'op': 'update', 'id': self.post.id, 'title': 'Bulk'}]},
+            content_type='application/json', **self.auth
+        )
+        
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.version), ('Bulk', 3))
+
+
+# Pins to the primary must be visible to every worker, so replicas refuse a per-process cache
+SHARED_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'blog_api_test_cache'),
+}}
+
+
+@override_settings(REPLICA_DATABASES=['replica'], CACHES=SHARED_CACHE)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    # The replica (a test mirror, see backend/test_settings.py) is a second
+    # connection, which only sees committed rows
+    databases = {'default', 'replica'}
+    
+    def setUp(self):
+        cache.clear()
+        health.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.post = Post.objects.create(title='Primary', content='Content', author=self.user)
+        self.detail_url = reverse('post_detail', kwargs={'post_id': self.post.id})
+    
+    def read(self, url, **extra):
+        """GET url and return the response with the number of queries run on the primary and on the replica"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(primary), len(replica)
+    
+    def test_reads_use_replica(self):
+        """Test marked views read from the replica while writes stay on the primary"""
+        for url in (self.detail_url, reverse('post_list')):
+            response, primary, replica = self.read(url)
+            self.assertEqual((primary > 0, replica > 0), (False, True))
+        self.assertEqual(response.json()['posts'][0]['title'], 'Primary')
+        
+        with CaptureQueriesContext(connections['replica']) as replica:
+            Post.objects.create(title='Second', content='Content', author=self.user)
+        self.assertEqual(len(replica), 0)
+    
+    def test_writer_reads_own_writes(self):
+        """Test a user's reads stay on the primary right after they write"""
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {access_token}'}
+        
+        response = self.client.patch(self.detail_url, {'content': 'Edited'}, content_type='application/json', **auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response, primary, replica = self.read(self.detail_url, **auth)
+        self.assertEqual((primary > 0, replica), (True, 0))
+        self.assertEqual(response.json()['content'], 'Edited')
+    
+    def test_per_process_cache_refused(self):
+        """Test replicas refuse to start with a cache the workers do not share"""
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaPinMiddleware(lambda request: None)
+        
+        with override_settings(REPLICA_DATABASES=[]):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaPinMiddleware(lambda request: None)
+    
+    def test_fresh_replica_responses_not_cached(self):
+        """Test replica answers are not cached while the replica may still be catching up"""
+        self.read(self.detail_url)
+        
+        with mock.patch.object(health, 'available', return_value=False):
+            _, primary, replica = self.read(self.detail_url)
+        self.assertEqual((primary > 0, replica), (True, 0))
+    
+    def test_unavailable_replica_skipped(self):
+        """Test reads fall back to the primary when the replica is down or lagging"""
+        with mock.patch.object(health, 'check', return_value=False):
+            _, primary, replica = self.read(self.detail_url)
+        self.assertEqual((primary > 0, replica), (True, 0))
+        
+        health.clear()
+        with override_settings(REPLICA_MAX_LAG_SECONDS=-1):
+            self.assertFalse(health.available('replica'))
+    
+    def test_replica_error_retried_on_primary(self):
+        """Test a read failing on the replica is retried on the primary"""
+        def fail(execute, sql, params, many, context):
+            raise OperationalError('server closed the connection unexpectedly')
+        
+        with mock.patch.object(health, 'check', return_value=True):
+            self.assertTrue(health.available('replica'))
+        with connections['replica'].execute_wrapper(fail):
+            response, primary, _ = self.read(self.detail_url)
+        self.assertEqual(response.json()['title'], 'Primary')
+        self.assertGreater(primary, 0)
+        
+        self.assertFalse(health.available('replica'))
+
+
+class StructuredLoggingTestCase(TestCase):
+    def setUp(self):
+        self.stream = StringIO()
+        self.handler = queue_handler(stream=self.stream)
+        self.logger = logging.getLogger('blog_api')
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.handler.close)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.logger.setLevel, self.logger.level)
+    
+    def records(self):
+        """Close the handler, which writes out everything queued, and parse the JSON lines"""
+        self.handler.close()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+    
+    def test_json_records(self):
+        """Test records are written as JSON with their extra fields and traceback"""
+        logger = logging.getLogger('blog_api.views')
+        logger.info('User logged in', extra={'user_id': 7})
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            logger.exception('Login failed')
+        
+        logged_in, failed = self.records()
+        self.assertEqual(logged_in['level'], 'INFO')
+        self.assertEqual(logged_in['logger'], 'blog_api.views')
+        self.assertEqual(logged_in['message'], 'User logged in')
+        self.assertEqual(logged_in['user_id'], 7)
+        self.assertIn('ValueError: broken', failed['exc_info'])
+    
+    def test_credentials_redacted(self):
+        """Test passwords and tokens never reach the log output"""
+        logger = logging.getLogger('blog_api.views')
+        logger.warning('Login request: %s', {'username': 'alice', 'password': 'hunter2'})
+        logger.warning('Header was Bearer abc.def.ghi', extra={'refresh_token': 'secret-token'})
+        
+        self.records()
+        output = self.stream.getvalue()
+        self.assertNotIn('hunter2', output)
+        self.assertNotIn('abc.def.ghi', output)
+        self.assertNotIn('secret-token', output)
+        self.assertIn('alice', output)
+    
+    def test_debug_records_skipped_lazily(self):
+        """Test records below the level are dropped before their arguments are formatted"""
+        data = mock.MagicMock()
+        self.logger.setLevel(logging.INFO)
+        logging.getLogger('blog_api.views').debug('Login request: %s', data)
+        
+        data.__str__.assert_not_called()
+        self.assertEqual(self.records(), [])
+    
+    def test_django_records_queued_once(self):
+        """Test Django's own loggers write only through the queue handler"""
+        django_logger = logging.getLogger('django')
+        
+        self.assertEqual([type(handler) for handler in django_logger.handlers], [type(self.handler)])
+        self.assertFalse(django_logger.propagate)
+    
+    def test_login_logs_without_password(self):
+        """Test logging in records the user but not the request body"""
+        User.objects.create_user(username='testuser', password='testpassword123')
+        
+        self.logger.setLevel(logging.DEBUG)
+        self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpassword123'}, content_type='application/json')
+        
+        records = self.records()
+        self.assertNotIn('testpassword123', self.stream.getvalue())
+        self.assertIn('User logged in', [record['message'] for record in records])
+
+
+class PostEngagementTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.clear()
+        self.addCleanup(counters.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.post = Post.objects.create(title='Test Post', content='Test content', author=self.user)
+        self.detail_url = reverse('post_detail', kwargs={'post_id': self.post.id})
+        self.like_url = reverse('post_like', kwargs={'post_id': self.post.id})
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access_token}'}
+    
+    def test_views_buffered_until_flush(self):
+        """Test detail views, cached or not, are counted in memory and written by a flush"""
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_200_OK)
+        self.client.get(reverse('post_detail', kwargs={'post_id': 999999}))
+        
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+        
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+        self.assertEqual(counters.pending(), 0)
+    
+    def test_flush_updates_per_delta(self):
+        """Test a flush issues one UPDATE per distinct delta, not one per post"""
+        posts = [self.post] + [
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user) for i in range(3)
+        ]
+        for post, views in zip(posts, (2, 1, 2, 1)):
+            for _ in range(views):
+                counters.add('view_count', post.id)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counters.flush(), 4)
+        
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('view_count', flat=True)), [2, 1, 2, 1]
+        )
+    
+    def test_failed_flush_keeps_deltas(self):
+        """Test counters survive a failed flush and are written by the next one"""
+        counters.add('view_count', self.post.id)
+        
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=OperationalError('gone')):
+            self.assertEqual(counters.flush(), 0)
+        self.assertEqual(counters.pending(), 1)
+        
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 1)
+    
+    def test_like_once_per_user(self):
+        """Test liking twice keeps one like, and the count follows likes and unlikes"""
+        self.assertEqual(self.client.post(self.like_url, **self.auth).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(self.like_url, **self.auth).status_code, status.HTTP_200_OK)
+        self.assertEqual(PostLike.objects.filter(post=self.post).count(), 1)
+        
+        self.client.get(self.detail_url)
+        counters.flush()
+        self.assertEqual(self.client.get(self.detail_url).json()['like_count'], 1)
+        
+        self.assertEqual(self.client.delete(self.like_url, **self.auth).json(), {'liked': False})
+        self.assertEqual(self.client.delete(self.like_url, **self.auth).status_code, status.HTTP_200_OK)
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(PostLike.objects.exists())
+    
+    def test_like_requires_post_and_login(self):
+        """Test liking a missing post is 404 and liking anonymously is 401"""
+        missing = reverse('post_like', kwargs={'post_id': 999999})
+        self.assertEqual(self.client.post(missing, **self.auth).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(missing, **self.auth).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post(self.like_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(PostLike.objects.exists())
+    
+    def test_counts_in_listings(self):
+        """Test listings return the stored counts without extra queries (the second one is the page's tags)"""
+        Post.objects.filter(id=self.post.id).update(view_count=12, like_count=3)
+        
+        with self.assertNumQueries(2):
+            page = self.client.get(reverse('post_list'), {'count': 'none'}).json()
+        self.assertEqual((page['posts'][0]['view_count'], page['posts'][0]['like_count']), (12, 3))
+        
+        excerpt = self.client.get(reverse('post_list'), {'view': 'excerpt', 'count': 'none'}).json()
+        self.assertEqual(excerpt['posts'][0]['like_count'], 3)
+    
+    def test_flushed_counts_change_etag(self):
+        """Test a flushed like changes the detail ETag, so revalidation fetches the new counts"""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(self.like_url, **self.auth)
+        counters.flush()
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['like_count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_delete_post_removes_likes(self):
+        """Test deleting a post deletes its likes"""
+        self.client.post(self.like_url, **self.auth)
+        
+        response = self.client.delete(self.detail_url, **self.auth)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(PostLike.objects.exists())
+    
+    async def test_async_detail_counts_views(self):
+        """Test the async detail view counts views too"""
+        request = AsyncRequestFactory().get(self.detail_url)
+        response = await AsyncPostDetailView.as_view()(request, post_id=self.post.id)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(counters.pending(), 1)
+
+
+class PostTagTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        access_token, _ = generate_token(self.user.id, self.user.username)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access_token}'}
+    
+    def create(self, title, tags):
+        response = self.client.post(
+            reverse('post_list'), {'title': title, 'content': 'Content', 'tags': tags},
+            content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()['id']
+    
+    def feed(self, slug, **params):
+        return self.client.get(reverse('tag_post_list', kwargs={'slug': slug}), params)
+    
+    def test_create_with_tags(self):
+        """Test tags are created once by slug and copy the post's creation time"""
+        post_id = self.create('First', ['Django', 'django ', 'Web Dev'])
+        self.create('Second', ['django'])
+        
+        self.assertEqual(sorted(Tag.objects.values_list('slug', flat=True)), ['django', 'web-dev'])
+        self.assertEqual(Tag.objects.get(slug='django').name, 'Django')
+        post = Post.objects.get(id=post_id)
+        self.assertEqual({tag.post_created_at for tag in PostTag.objects.filter(post=post)}, {post.created_at})
+    
+    def test_invalid_tags_rejected(self):
+        """Test malformed or too many tags are rejected without creating the post"""
+        for tags in ('django', ['!!!'], [f'tag{i}' for i in range(11)]):
+            response = self.client.post(
+                reverse('post_list'), {'title': 'Post', 'content': 'Content', 'tags': tags},
+                content_type='application/json', **self.auth
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+    
+    def test_tag_feed_keyset(self):
+        """Test the tag feed pages newest first with a cursor and reports the tag's count"""
+        for i in range(5):
+            self.create(f'Tagged {i}', ['python'] if i % 2 == 0 else ['python', 'misc'])
+        self.create('Untagged', [])
+        
+        first = self.feed('python', page_size=3).json()
+        self.assertEqual([post['title'] for post in first['posts']], ['Tagged 4', 'Tagged 3', 'Tagged 2'])
+        self.assertEqual(first['total_posts'], 5)
+        self.assertEqual(first['posts'][1]['tags'], ['misc', 'python'])
+        self.assertNotIn('feed_created_at', first['posts'][0])
+        
+        second = self.feed('python', page_size=3, cursor=first['next_cursor']).json()
+        self.assertEqual([post['title'] for post in second['posts']], ['Tagged 1', 'Tagged 0'])
+        self.assertFalse(second['has_next'])
+        self.assertEqual(self.feed('missing').status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_list_prefetches_tags(self):
+        """Test a list page gets its posts' tags in one query, and only when selected"""
+        for i in range(4):
+            self.create(f'Post {i}', ['a', 'b'])
+        
+        with CaptureQueriesContext(connection) as queries:
+            posts = self.client.get(reverse('post_list'), {'count': 'none'}).json()['posts']
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([post['tags'] for post in posts], [['a', 'b']] * 4)
+        
+        sparse = self.client.get(reverse('post_list'), {'fields': 'title,tags', 'count': 'none'}).json()['posts']
+        self.assertEqual(sparse[0], {'title': 'Post 3', 'tags': ['a', 'b']})
+        self.assertNotIn('tags', self.client.get(reverse('post_list'), {'fields': 'title'}).json()['posts'][0])
+    
+    def test_rejected_delete_keeps_likes_and_tags(self):
+        """Test a delete rejected after removing the likes and tags rolls them back"""
+        post_id = self.create('First', ['django'])
+        PostLike.objects.create(user=self.user, post_id=post_id)
+        post_table = Post._meta.db_table
+        
+        def edit_first(execute, sql, params, many, context):
+            if sql.startswith(f'DELETE FROM "{post_table}"'):
+                # Another request edits the post between the child deletes and the post's
+                execute(f'UPDATE "{post_table}" SET version = version + 1 WHERE id = %s', [post_id], False, context)
+            return execute(sql, params, many, context)
+        
+        with connection.execute_wrapper(edit_first):
+            response = self.client.delete(
+                reverse('post_detail', kwargs={'post_id': post_id}), HTTP_IF_MATCH='"1"', **self.auth
+            )
+        
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(PostLike.objects.filter(post_id=post_id).exists())
+        self.assertEqual(list(PostTag.objects.filter(post_id=post_id).values_list('tag__slug', flat=True)), ['django'])
+    
+    def test_counts_follow_changes(self):
+        """Test cached tag counts follow retagging and deletes without recounting"""
+        first = self.create('First', ['a', 'b'])
+        self.create('Second', ['a'])
+        a, b = Tag.objects.get(slug='a'), Tag.objects.get(slug='b')
+        self.assertEqual((tag_post_count(a.id).get(), tag_post_count(b.id).get()), (2, 1))
+        
+        detail_url = reverse('post_detail', kwargs={'post_id': first})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(detail_url, {'tags': ['b', 'c']}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['version'], 2)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual((tag_post_count(a.id).get(), tag_post_count(b.id).get()), (1, 1))
+        # New tags are counted on first read
+        c = Tag.objects.get(slug='c')
+        self.assertEqual(tag_post_count(c.id).get(), 1)
+        self.assertEqual(self.feed('a').json()['posts'][0]['title'], 'Second')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail_url, **self.auth)
+        self.assertEqual((tag_post_count(b.id).get(), tag_post_count(c.id).get()), (0, 0))
+        self.assertFalse(PostTag.objects.filter(post_id=first).exists())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.filter(title='Second').delete()
+        self.assertEqual(tag_post_count(a.id).get(), 0)
@@ -0,0 +1,171 @@
+"""
+Refresh token store: rotation, reuse detection and revocation.
+
+Every refresh token has a RefreshToken row keyed by its jti. Refreshing
+revokes the presented token and issues its successor in the same family,
+i.e. the same login session. A token that is presented again after being
+rotated has leaked, so the whole family is revoked.
+
+Access tokens carry their family as `sid`, and jwt_required rejects them
+once no token of the family is left unrevoked. The answer is kept in
+process: a revoked family in the denylist for the lifetime of an access
+token, a live one for JWT_SESSION_CHECK_INTERVAL seconds, so a logout on
+another worker takes effect within that interval at the cost of one query
+per session and interval.
+"""
+import datetime
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import jwt
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import RefreshToken, User
+
+REFRESH_TOKEN_LIFETIME = datetime.timedelta(days=7)
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+class RefreshTokenReused(InvalidRefreshToken):
+    pass
+
+
+class ExpiringSet:
+    """Bounded LRU of ids, each kept until its own expiry"""
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, ttl):
+        with self._lock:
+            self._entries[key] = time.monotonic() + ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        expires = self._entries.get(key)
+        return expires is not None and expires > time.monotonic()
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+denylist = ExpiringSet(getattr(settings, 'JWT_DENYLIST_SIZE', 10000))
+live_sessions = ExpiringSet(getattr(settings, 'JWT_DENYLIST_SIZE', 10000))
+
+
+def issue_refresh_token(user_id, family=None):
+    """Create and record a refresh token, in a new family unless one is given. Returns (token, family)."""
+    family = family or uuid.uuid4()
+    jti = secrets.token_hex(16)
+    now = timezone.now()
+    RefreshToken.objects.create(jti=jti, family=family, user_id=user_id, expires_at=now + REFRESH_TOKEN_LIFETIME)
+    return _encode(user_id, jti, family, now), family
+
+
+def _encode(user_id, jti, family, now):
+    payload = {
+        'user_id': user_id,
+        'jti': jti,
+        'sid': str(family),
+        'type': 'refresh',
+        'exp': now + REFRESH_TOKEN_LIFETIME,
+        'iat': now,
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def rotate_refresh_token(payload):
+    """
+    Exchange a decoded refresh token for its successor. Returns
+    (user, refresh_token, family); raises InvalidRefreshToken, or
+    RefreshTokenReused after revoking the family of a replayed token.
+    """
+    jti, family = payload.get('jti'), payload.get('sid')
+    if not jti or not family or payload.get('type') != 'refresh':
+        raise InvalidRefreshToken('Refresh token is not recognised')
+    if family in denylist:
+        raise InvalidRefreshToken('Session has been revoked')
+
+    now = timezone.now()
+    next_jti = secrets.token_hex(16)
+    with transaction.atomic():
+        # Only one request can move a token from active to replaced
+        rotated = RefreshToken.objects.filter(
+            jti=jti, revoked_at__isnull=True, expires_at__gt=now,
+        ).update(revoked_at=now, replaced_by=next_jti)
+        if rotated:
+            user = User.objects.get(id=payload['user_id'], is_active=True)
+            RefreshToken.objects.create(
+                jti=next_jti, family=family, user_id=user.id, expires_at=now + REFRESH_TOKEN_LIFETIME,
+            )
+
+    if not rotated:
+        if RefreshToken.objects.filter(jti=jti, revoked_at__isnull=False).exists():
+            revoke_family(family)
+            raise RefreshTokenReused('Refresh token was already used; session revoked')
+        raise InvalidRefreshToken('Refresh token is not recognised')
+    return user, _encode(user.id, next_jti, family, now), family
+
+
+def revoke_family(family):
+    """Revoke every refresh token of a session and reject its access tokens"""
+    from .utils import ACCESS_TOKEN_LIFETIME
+    RefreshToken.objects.filter(family=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    live_sessions.discard(str(family))
+    denylist.add(str(family), ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def _known_revocation(family):
+    """True or False when this process knows whether family is revoked, else None"""
+    if family in denylist:
+        return True
+    if family in live_sessions:
+        return False
+    return None
+
+
+def _remember(family, revoked):
+    from .utils import ACCESS_TOKEN_LIFETIME
+    if revoked:
+        denylist.add(family, ACCESS_TOKEN_LIFETIME.total_seconds())
+    else:
+        live_sessions.add(family, getattr(settings, 'JWT_SESSION_CHECK_INTERVAL', 5))
+    return revoked
+
+
+def is_session_revoked(payload):
+    """Whether an access token belongs to a revoked family (or one with only expired tokens)"""
+    family = payload.get('sid')
+    if family is None:
+        return False
+    revoked = _known_revocation(family)
+    if revoked is None:
+        live = RefreshToken.objects.filter(family=family, revoked_at__isnull=True).exists()
+        revoked = _remember(family, not live)
+    return revoked
+
+
+async def ais_session_revoked(payload):
+    """Async variant of is_session_revoked"""
+    family = payload.get('sid')
+    if family is None:
+        return False
+    revoked = _known_revocation(family)
+    if revoked is None:
+        live = await RefreshToken.objects.filter(family=family, revoked_at__isnull=True).aexists()
+        revoked = _remember(family, not live)
+    return revoked
@@ -1,5 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, PostListView, PostDetailView, RefreshTokenView
+from .views import AuthorPostListView, MetricsView, RegisterView, LoginView, LogoutView, PostListView, PostDetailView, PostLikeView, PostBulkView, PostExportView, PostSearchView, RefreshTokenView, TagPostListView
+
+# Serve the ASGI-native views when running under an ASGI server
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from .async_views import (
+        AsyncLoginView as LoginView,
+        AsyncPostDetailView as PostDetailView,
+        AsyncPostListView as PostListView,
+        AsyncRefreshTokenView as RefreshTokenView,
+    )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -7,5 +17,12 @@ urlpatterns = [
     path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/refresh-token/', RefreshTokenView.as_view(), name='refresh_token'),
     path('posts/', PostListView.as_view(), name='post_list'),
+    path('posts/bulk/', PostBulkView.as_view(), name='post_bulk'),
+    path('posts/export/', PostExportView.as_view(), name='post_export'),
+    path('posts/search/', PostSearchView.as_view(), name='post_search'),
     path('posts/<int:post_id>/', PostDetailView.as_view(), name='post_detail'),
+    path('posts/<int:post_id>/like/', PostLikeView.as_view(), name='post_like'),
+    path('tags/<slug:slug>/posts/', TagPostListView.as_view(), name='tag_post_list'),
+    path('users/<str:username>/posts/', AuthorPostListView.as_view(), name='author_post_list'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
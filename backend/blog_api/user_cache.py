@@ -0,0 +1,83 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class UserCache:
+    """
+    Bounded LRU of authenticated users with a TTL, so jwt_required does not
+    hit the database for every request. Entries are dropped by signals when
+    a user is saved or deleted (see signals.py).
+    """
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return a copy of the cached user, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            user = entry[0]
+        # Hand out a copy so a view mutating request.user cannot poison the cache
+        return copy.copy(user)
+
+    def set(self, user):
+        with self._lock:
+            self._entries[user.pk] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def revoke(self, user_id, lifetime):
+        """Reject tokens for user_id issued before now, for the next `lifetime` seconds"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._revoked = {uid: (at, until) for uid, (at, until) in self._revoked.items() if until > now}
+            self._revoked[user_id] = (now, now + lifetime)
+
+    def is_revoked(self, user_id, issued_at):
+        entry = self._revoked.get(user_id)
+        if entry is None:
+            return False
+        revoked_at, until = entry
+        return until > time.time() and issued_at <= revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 60),
+)
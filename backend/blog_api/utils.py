@@ -1,73 +1,193 @@
 import jwt
 import datetime
+import logging
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
 from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from . import tokens
+from .responses import JsonResponse
+from .tokens import ais_session_revoked, is_session_revoked, issue_refresh_token
+from .user_cache import user_cache
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-def generate_token(user_id):
-    """Generate JWT token for a user"""
+ACCESS_TOKEN_LIFETIME = datetime.timedelta(minutes=15)
+
+class TokenUser:
+    """
+    Principal built from the claims embedded in an access token. Views that
+    only need the user's id and username can use it without loading the User row.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, username):
+        self.id = self.pk = user_id
+        self.username = username
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.username
+
+def generate_access_token(user_id, username=None, family=None):
+    """Access token for a user, tied to the session (refresh token family) it was issued for"""
     access_token_payload = {
         'user_id': user_id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=15), # Access token valid for 15 minutes
+        'type': 'access',
+        'exp': datetime.datetime.utcnow() + ACCESS_TOKEN_LIFETIME, # Access token valid for 15 minutes
         'iat': datetime.datetime.utcnow()
     }
-    access_token = jwt.encode(access_token_payload, settings.SECRET_KEY, algorithm='HS256')
+    if family is not None:
+        access_token_payload['sid'] = str(family)
+    if username is not None and getattr(settings, 'JWT_EMBED_USER_CLAIMS', False):
+        access_token_payload['username'] = username
+    return jwt.encode(access_token_payload, settings.SECRET_KEY, algorithm='HS256')
 
-    refresh_token_payload = {
-        'user_id': user_id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7), # Refresh token valid for 7 days
-        'iat': datetime.datetime.utcnow()
-    }
-    refresh_token = jwt.encode(refresh_token_payload, settings.SECRET_KEY, algorithm='HS256')
+def generate_token(user_id, username=None):
+    """Generate JWT token for a user"""
+    # Refresh token valid for 7 days, recorded so it can be rotated and revoked
+    refresh_token, family = issue_refresh_token(user_id)
+    access_token = generate_access_token(user_id, username, family)
 
     return access_token, refresh_token
 
+agenerate_token = sync_to_async(generate_token)
+
+def _decode_access_token(token):
+    """Claims of a valid access token; raises jwt.InvalidTokenError for any other token, refresh tokens included"""
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+    if payload.get('type') != 'access':
+        raise jwt.InvalidTokenError('Not an access token')
+    return payload
+
+def _cached_principal(payload):
+    """
+    User for the payload of an access token whose session is live, when no
+    query is needed: a TokenUser for tokens carrying the claims the views
+    need, else a cached user. Returns (user, revoked).
+    """
+    user_id = payload['user_id']
+    # Tokens carrying the claims the views need are trusted without a lookup,
+    # unless the user was deactivated or deleted after the token was issued
+    if 'username' in payload and getattr(settings, 'JWT_EMBED_USER_CLAIMS', False):
+        if user_cache.is_revoked(user_id, payload['iat']):
+            return None, True
+        return TokenUser(user_id, payload['username']), False
+    return user_cache.get(user_id), False
+
 def verify_token(token):
     """Verify JWT token and return user"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        user = User.objects.get(id=user_id)
+        payload = _decode_access_token(token)
+        if is_session_revoked(payload):
+            return None
+        user, revoked = _cached_principal(payload)
+        if user is None and not revoked:
+            user = User.objects.get(id=payload['user_id'], is_active=True)
+            user_cache.set(user)
         return user
     except jwt.ExpiredSignatureError:
-        print("Token has expired")
+        logger.debug('Access token has expired')
         return None
     except jwt.InvalidTokenError:
-        print("Invalid token")
+        logger.debug('Invalid access token')
         return None
     except User.DoesNotExist:
-        print("User not found")
+        logger.debug('User of access token not found')
         return None
 
-def verify_refresh_token(token):
-    """Verify JWT refresh token and return user"""
+async def averify_token(token):
+    """Async variant of verify_token"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-        user_id = payload['user_id']
-        user = User.objects.get(id=user_id)
+        payload = _decode_access_token(token)
+        if await ais_session_revoked(payload):
+            return None
+        user, revoked = _cached_principal(payload)
+        if user is None and not revoked:
+            user = await User.objects.aget(id=payload['user_id'], is_active=True)
+            user_cache.set(user)
         return user
+    except jwt.InvalidTokenError:
+        return None
+    except User.DoesNotExist:
+        return None
+
+def rotate_refresh_token(token):
+    """Verify a JWT refresh token and exchange it. Returns (user, access token, refresh token) or None."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        user, refresh_token, family = tokens.rotate_refresh_token(payload)
+        return user, generate_access_token(user.id, user.username, family), refresh_token
     except jwt.ExpiredSignatureError:
-        print("Refresh token has expired")
+        logger.debug('Refresh token has expired')
         return None
     except jwt.InvalidTokenError:
-        print("Invalid refresh token")
+        logger.debug('Invalid refresh token')
+        return None
+    except tokens.RefreshTokenReused:
+        logger.warning(
+            'Refresh token reuse detected, session revoked',
+            extra={'user_id': payload.get('user_id'), 'sid': payload.get('sid')},
+        )
+        return None
+    except tokens.InvalidRefreshToken:
+        logger.debug('Refresh token revoked or unknown')
         return None
     except User.DoesNotExist:
-        print("User not found for refresh token")
+        logger.debug('User of refresh token not found')
         return None
 
+arotate_refresh_token = sync_to_async(rotate_refresh_token)
+
+def revoke_session(token):
+    """Revoke the session of an access or refresh token. Returns whether one was revoked."""
+    try:
+        # Expired tokens may still name a session whose refresh tokens are live
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'], options={'verify_exp': False})
+    except jwt.InvalidTokenError:
+        return False
+    if not payload.get('sid'):
+        return False
+    tokens.revoke_family(payload['sid'])
+    return True
+
+def bearer_token(request):
+    auth_header = request.META.get('HTTP_AUTHORIZATION')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
 def jwt_required(view_func):
     """Decorator to require JWT authentication for views"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            token = bearer_token(request)
+            if not token:
+                return JsonResponse({'error': 'Authorization header missing or invalid'}, status=401)
+
+            user = await averify_token(token)
+            if not user:
+                return JsonResponse({'error': 'Invalid or expired token'}, status=401)
+
+            request.user = user
+            return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        auth_header = request.META.get('HTTP_AUTHORIZATION')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token = bearer_token(request)
+        if not token:
             return JsonResponse({'error': 'Authorization header missing or invalid'}, status=401)
         
-        token = auth_header.split(' ')[1]
         user = verify_token(token)
         
         if not user:
@@ -76,4 +196,4 @@ def jwt_required(view_func):
         request.user = user
         return view_func(request, *args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -1,51 +1,78 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib.auth import authenticate
-from django.core.paginator import Paginator
-from .models import User, Post
-from .utils import generate_token, jwt_required, verify_refresh_token
+from .models import User, Post, Tag
+from .authentication import users_with_email
+from .utils import bearer_token, generate_token, jwt_required, revoke_session, rotate_refresh_token
+from .bulk import apply_post_operations
+from .counts import author_post_count, get_post_count, tag_post_count
+from .engagement import like_post, record_view, unlike_post
+from .export import export_queryset, gzip_stream, ndjson_lines
+from .hashing import HashingPoolFull, hash_password
+from .metrics import registry
+from .pagination import InvalidCursor, get_page_size, keyset_page
+from .queries import TAGS_FIELD, PostListQuery, drop_unselected, parse_fields, post_payload, select_columns
+from .ratelimit import ratelimit
+from .responses import JsonResponse
+from .routers import replica_reads
+from .response_cache import (
+    author_post_list_key, cache_response, post_detail_key, post_list_key, post_search_key, tag_post_list_key,
+)
+from .search import SearchUnavailable, search_posts
+from .tags import attach_tags, create_post, parse_tags, tag_feed_queryset
+from .writes import PostWriteError, delete_post, expected_version, post_etag, update_post
+import hmac
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def hashing_unavailable(error):
+    """503 for requests rejected by a saturated password hashing pool"""
+    response = JsonResponse({'error': str(error)}, status=503)
+    response['Retry-After'] = '1'
+    return response
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RegisterView(View):
+    @method_decorator(ratelimit('register'))
     def post(self, request):
         try:
-            print("Registration request received")
             data = json.loads(request.body)
-            print(f"Request data: {data}")
+            # Lazily formatted, and only when debug logging is on; the password is redacted
+            logger.debug('Registration request: %s', data)
             username = data.get('username')
             email = data.get('email')
             password = data.get('password')
             first_name = data.get('first_name', '')
             last_name = data.get('last_name', '')
             
-            print(f"Extracted data - username: {username}, email: {email}")
-            
             if not username or not password:
-                print("Missing username or password")
                 return JsonResponse({'error': 'Username and password are required'}, status=400)
             
             if User.objects.filter(username=username).exists():
-                print("Username already exists")
                 return JsonResponse({'error': 'Username already exists'}, status=400)
             
-            print("Creating user...")
-            # Create user with all provided fields
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password,
+            if email and users_with_email(email).exists():
+                return JsonResponse({'error': 'Email already exists'}, status=400)
+            
+            # Create user with all provided fields, hashing the password on the hashing pool
+            user = User(
+                username=User.normalize_username(username),
+                email=User.objects.normalize_email(email),
+                password=hash_password(password),
                 first_name=first_name,
                 last_name=last_name
             )
-            print(f"User created successfully: {user.username}")
+            user.save()
+            logger.info('User registered', extra={'user_id': user.id, 'username': user.username})
             
             # Generate token for the new user
-            access_token, refresh_token = generate_token(user.id)
-            print("Token generated")
+            access_token, refresh_token = generate_token(user.id, user.username)
             
             # Return token and user data to match frontend expectations
             user_data = {
@@ -56,38 +83,37 @@ class RegisterView(View):
                 'last_name': user.last_name
             }
             
-            print("Sending success response")
             return JsonResponse({
                 'access_token': access_token,
                 'refresh_token': refresh_token,
                 'user': user_data
             }, status=201)
+        except HashingPoolFull as e:
+            return hashing_unavailable(e)
         except Exception as e:
-            print(f"Registration error: {str(e)}")
+            logger.warning('Registration failed: %s', e)
             return JsonResponse({'error': str(e)}, status=400)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class LoginView(View):
+    @method_decorator(ratelimit('login'))
     def post(self, request):
         try:
-            print("Login request received")
             data = json.loads(request.body)
-            print(f"Login data: {data}")
+            logger.debug('Login request: %s', data)
             username = data.get('username')
             password = data.get('password')
             
             if not username or not password:
-                print("Missing username or password")
                 return JsonResponse({'error': 'Username and password are required'}, status=400)
             
             user = authenticate(username=username, password=password)
             if not user:
-                print("Invalid credentials")
+                logger.info('Login failed', extra={'username': username})
                 return JsonResponse({'error': 'Invalid credentials'}, status=401)
             
-            print(f"User authenticated: {user.username}")
-            access_token, refresh_token = generate_token(user.id)
-            print("Token generated")
+            logger.info('User logged in', extra={'user_id': user.id})
+            access_token, refresh_token = generate_token(user.id, user.username)
             
             # Return token and user data to match frontend expectations
             user_data = {
@@ -98,39 +124,35 @@ class LoginView(View):
                 'last_name': user.last_name
             }
             
-            print("Sending success response")
             return JsonResponse({
                 'access_token': access_token,
                 'refresh_token': refresh_token,
                 'user': user_data
             }, status=200)
+        except HashingPoolFull as e:
+            return hashing_unavailable(e)
         except Exception as e:
-            print(f"Login error: {str(e)}")
+            logger.warning('Login failed: %s', e)
             return JsonResponse({'error': str(e)}, status=400)
 
+@method_decorator(csrf_exempt, name='dispatch')
 class PostListView(View):
+    @method_decorator(cache_response(post_list_key))
+    @method_decorator(replica_reads)
     def get(self, request):
-        page_number = request.GET.get('page', 1)
-        page_size = request.GET.get('page_size', 10)
-        
-        posts = Post.objects.all().values('id', 'title', 'content', 'author__username', 'created_at').order_by('-created_at')
-        paginator = Paginator(posts, page_size)
-        
-        try:
-            page_obj = paginator.page(page_number)
-        except Exception:
-            page_obj = paginator.page(1) # Fallback to first page if page_number is invalid
-            
-        return JsonResponse({
-            'posts': list(page_obj.object_list),
-            'page': page_obj.number,
-            'pages': paginator.num_pages,
-            'has_next': page_obj.has_next(),
-            'has_previous': page_obj.has_previous(),
-            'total_posts': paginator.count,
-        }, safe=False)
+        try:
+            listing = PostListQuery(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        count = get_post_count(listing.count_mode)
+        rows = list(listing.page_queryset(count))
+        if listing.with_tags:
+            attach_tags(rows)
+        return JsonResponse(listing.payload(rows, count), safe=False)
     
-    @jwt_required
+    @method_decorator(jwt_required)
+    @method_decorator(ratelimit('post_create'))
     def post(self, request):
         try:
             data = json.loads(request.body)
@@ -140,80 +162,224 @@ class PostListView(View):
             if not title or not content:
                 return JsonResponse({'error': 'Title and content are required'}, status=400)
             
-            post = Post.objects.create(title=title, content=content, author=request.user)
-            return JsonResponse({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat()
-            }, status=201)
+            post = create_post(title, content, request.user.id, parse_tags(data.get('tags', [])))
+            return JsonResponse(post_payload(post, request.user.username), status=201)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PostBulkView(View):
+    @method_decorator(jwt_required)
+    @method_decorator(ratelimit('post_bulk'))
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            operations = data.get('operations') if isinstance(data, dict) else data
+            results = apply_post_operations(request.user, operations)
+            return JsonResponse({'results': results})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
+class PostExportView(View):
+    @method_decorator(replica_reads)
+    def get(self, request):
+        try:
+            posts = export_queryset(
+                author=request.GET.get('author'),
+                since=request.GET.get('since'),
+                until=request.GET.get('until'),
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        stream = ndjson_lines(posts)
+        compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if compress:
+            stream = gzip_stream(stream)
+
+        response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="posts.ndjson"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+class PostSearchView(View):
+    @method_decorator(cache_response(post_search_key))
+    @method_decorator(replica_reads)
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'error': 'Search query q is required'}, status=400)
+
+        page_size = get_page_size(request)
+        try:
+            rows, next_cursor = search_posts(query, request.GET.get('cursor'), page_size)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except SearchUnavailable as e:
+            return JsonResponse({'error': str(e)}, status=501)
+
+        return JsonResponse({
+            'posts': rows,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'page_size': page_size,
+        })
+
+class AuthorPostListView(View):
+    @method_decorator(cache_response(author_post_list_key))
+    @method_decorator(replica_reads)
+    def get(self, request, username):
+        try:
+            author = User.objects.only('id').get(username=username)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+
+        page_size = get_page_size(request)
+        try:
+            fields = parse_fields(request)
+            # The cursor is built from the sort keys, so always select them
+            columns = select_columns(fields, 'created_at', 'id')
+            posts = Post.objects.filter(author_id=author.id).values(*columns)
+            rows, next_cursor = keyset_page(posts, request.GET.get('cursor'), page_size)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if TAGS_FIELD in fields:
+            attach_tags(rows)
+        rows = drop_unselected(rows, columns, fields)
+        return JsonResponse({
+            'author': username,
+            'posts': rows,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'page_size': page_size,
+            'total_posts': author_post_count(author.id).get(),
+        })
+
+class TagPostListView(View):
+    @method_decorator(cache_response(tag_post_list_key))
+    @method_decorator(replica_reads)
+    def get(self, request, slug):
+        try:
+            tag = Tag.objects.only('id', 'name').get(slug=slug)
+        except Tag.DoesNotExist:
+            return JsonResponse({'error': 'Tag not found'}, status=404)
+
+        page_size = get_page_size(request)
+        try:
+            fields = parse_fields(request)
+            columns = select_columns(fields, 'id')
+            # Paged on the tag rows' copy of (created_at, post id), in index order
+            posts = tag_feed_queryset(tag.id, columns)
+            rows, next_cursor = keyset_page(
+                posts, request.GET.get('cursor'), page_size, created_field='feed_created_at', id_field='feed_post_id',
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if TAGS_FIELD in fields:
+            attach_tags(rows)
+        rows = drop_unselected(rows, columns + ('feed_created_at', 'feed_post_id'), fields)
+        return JsonResponse({
+            'tag': slug,
+            'name': tag.name,
+            'posts': rows,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None,
+            'page_size': page_size,
+            'total_posts': tag_post_count(tag.id).get(),
+        })
+
+@method_decorator(csrf_exempt, name='dispatch')
 class PostDetailView(View):
+    @method_decorator(record_view)
+    @method_decorator(cache_response(post_detail_key))
+    @method_decorator(replica_reads)
     def get(self, request, post_id):
         try:
             post = Post.objects.select_related('author').get(id=post_id)
-            return JsonResponse({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat()
-            })
+            response = JsonResponse(post_payload(post, post.author.username))
+            response['ETag'] = post_etag(post)
+            return response
         except Post.DoesNotExist:
             return JsonResponse({'error': 'Post not found'}, status=404)
     
-    @jwt_required
+    @method_decorator(jwt_required)
     def put(self, request, post_id):
+        return self.update(request, post_id)
+    
+    @method_decorator(jwt_required)
+    def patch(self, request, post_id):
+        return self.update(request, post_id)
+    
+    def update(self, request, post_id):
         try:
-            post = Post.objects.get(id=post_id)
-            
-            # Check if the user is the author of the post
-            if post.author != request.user:
-                return JsonResponse({'error': 'Unauthorized'}, status=403)
-            
             data = json.loads(request.body)
-            post.title = data.get('title', post.title)
-            post.content = data.get('content', post.content)
-            post.save()
-            
-            return JsonResponse({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat()
-            })
-        except Post.DoesNotExist:
-            return JsonResponse({'error': 'Post not found'}, status=404)
+            # One UPDATE ... WHERE id AND author_id [AND version]
+            post = update_post(post_id, request.user.id, data, expected_version(request))
+            response = JsonResponse(post_payload(post, request.user.username))
+            response['ETag'] = post_etag(post)
+            return response
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
     
-    @jwt_required
+    @method_decorator(jwt_required)
     def delete(self, request, post_id):
         try:
-            post = Post.objects.get(id=post_id)
-            
-            # Check if the user is the author of the post
-            if post.author != request.user:
-                return JsonResponse({'error': 'Unauthorized'}, status=403)
-            
-            post.delete()
+            delete_post(post_id, request.user.id, expected_version(request))
             return JsonResponse({'message': 'Post deleted successfully'})
-        except Post.DoesNotExist:
-            return JsonResponse({'error': 'Post not found'}, status=404)
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
+@method_decorator(csrf_exempt, name='dispatch')
+class PostLikeView(View):
+    # like_count catches up when the counters are next flushed (see engagement.py)
+    @method_decorator(jwt_required)
+    def post(self, request, post_id):
+        try:
+            created = like_post(post_id, request.user.id)
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return JsonResponse({'liked': True}, status=201 if created else 200)
+    
+    @method_decorator(jwt_required)
+    def delete(self, request, post_id):
+        try:
+            unlike_post(post_id, request.user.id)
+        except PostWriteError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return JsonResponse({'liked': False})
+
 @method_decorator(csrf_exempt, name='dispatch')
 class LogoutView(View):
     def post(self, request):
-        # For JWT authentication, logout is typically handled client-side
-        # by deleting the token. Server-side we just return a success response.
+        # Revoke the session named by the refresh token in the body, or else by
+        # the bearer access token: its refresh tokens stop working and its
+        # access tokens are rejected. Logging out always succeeds.
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except ValueError:
+            data = {}
+        token = data.get('refresh_token') if isinstance(data, dict) else None
+        revoke_session(token or bearer_token(request) or '')
         return JsonResponse({'message': 'Logged out successfully'}, status=200)
 
+class MetricsView(View):
+    def get(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        # Constant-time comparison, on bytes so non-ASCII headers are simply wrong
+        if token and not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(), f'Bearer {token}'.encode()
+        ):
+            return JsonResponse({'error': 'Unauthorized'}, status=401)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RefreshTokenView(View):
     def post(self, request):
@@ -224,12 +390,13 @@ class RefreshTokenView(View):
             if not refresh_token:
                 return JsonResponse({'error': 'Refresh token is required'}, status=400)
 
-            user = verify_refresh_token(refresh_token)
+            # Rotation: the presented token is spent and replaced by a new one
+            rotated = rotate_refresh_token(refresh_token)
 
-            if not user:
+            if not rotated:
                 return JsonResponse({'error': 'Invalid or expired refresh token'}, status=401)
 
-            access_token, new_refresh_token = generate_token(user.id)
+            _, access_token, new_refresh_token = rotated
 
             return JsonResponse({
                 'access_token': access_token,
@@ -0,0 +1,212 @@
+"""
+Ownership-checked, conditional writes for the post detail views.
+
+An update or delete is one statement, UPDATE/DELETE ... WHERE id = %s AND
+author_id = %s, optionally AND version = %s when the client sent If-Match
+(a delete first removes the post's likes and tags under the same conditions).
+Only when no row matched is the post looked up again, to tell a missing post
+(404) from someone else's (403) and from a stale version (412).
+
+Updates return the written row with RETURNING, so a successful write is a
+single round trip. The statements bypass Post.save and model signals, so the
+excerpt, cached counts and cached responses are maintained here.
+"""
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+from .counts import author_post_count, post_count, tag_post_count
+from .models import Post, PostLike, PostTag, make_excerpt
+from .response_cache import bump_generation
+from .tags import parse_tags, set_post_tags
+
+UPDATABLE_FIELDS = ('title', 'content')
+RETURNED_FIELDS = (
+    'id', 'title', 'content', 'excerpt', 'author_id', 'created_at', 'updated_at', 'version', 'view_count', 'like_count',
+)
+
+
+class PostWriteError(Exception):
+    status = 400
+
+
+class PostNotFound(PostWriteError):
+    status = 404
+
+    def __init__(self, message='Post not found'):
+        super().__init__(message)
+
+
+class NotPostAuthor(PostWriteError):
+    status = 403
+
+    def __init__(self, message='Unauthorized'):
+        super().__init__(message)
+
+
+class PreconditionFailed(PostWriteError):
+    status = 412
+
+    def __init__(self, message='Post has been modified; fetch it again and retry'):
+        super().__init__(message)
+
+
+def post_etag(post):
+    """
+    ETag of a post's detail body: its version, which If-Match compares, then
+    the view and like counters, which change without moving the version
+    """
+    return f'"{post.version}-{post.view_count}-{post.like_count}"'
+
+
+def expected_version(request):
+    """
+    The version named by an If-Match header (the leading part of a post_etag,
+    or a bare version): None when absent or '*', else an int. A tag that
+    cannot be one of ours can never match, so it raises PreconditionFailed.
+    """
+    header = request.META.get('HTTP_IF_MATCH')
+    if not header:
+        return None
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return None
+    # A single version is expected; weak tags compare by value
+    if len(etags) == 1:
+        tag = etags[0].removeprefix('W/').strip('"').partition('-')[0]
+        if tag.isdigit():
+            return int(tag)
+    raise PreconditionFailed()
+
+
+def _parse_changes(data):
+    """(column changes, parsed tags or None when the tags are left alone)"""
+    if not isinstance(data, dict):
+        raise PostWriteError('Request body must be a JSON object')
+    changes = {name: data[name] for name in UPDATABLE_FIELDS if name in data}
+    for name, value in changes.items():
+        if not isinstance(value, str) or not value:
+            raise PostWriteError(f'{name} must be a non-empty string')
+    tags = None
+    if 'tags' in data:
+        try:
+            tags = parse_tags(data['tags'])
+        except ValueError as e:
+            raise PostWriteError(str(e))
+    if not changes and tags is None:
+        raise PostWriteError('Nothing to update')
+    return changes, tags
+
+
+def _rejection(using, post_id, author_id, version):
+    """Why a conditional write matched no row; one extra query, on the failure path only"""
+    row = Post.objects.using(using).filter(id=post_id).values_list('author_id', 'version').first()
+    if row is None:
+        return PostNotFound()
+    if row[0] != author_id:
+        return NotPostAuthor()
+    return PreconditionFailed()
+
+
+def _supports_returning(connection):
+    # Django's flag follows the SQLite version (3.35+); MariaDB also sets it
+    # but has no UPDATE ... RETURNING, hence the vendors
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def update_post(post_id, author_id, data, version=None):
+    """
+    Apply the title/content/tags present in data to a post owned by author_id
+    and return the updated Post; omitted fields keep their values. Raises a
+    PostWriteError subclass.
+    """
+    changes, tags = _parse_changes(data)
+    if 'content' in changes:
+        changes['excerpt'] = make_excerpt(changes['content'])
+    changes['updated_at'] = timezone.now()
+
+    conditions = {'id': post_id, 'author_id': author_id}
+    if version is not None:
+        conditions['version'] = version
+
+    using = router.db_for_write(Post)
+    if tags is None:
+        post = _update(using, post_id, changes, conditions)
+    else:
+        # The tags change with the row or not at all
+        with transaction.atomic(using=using):
+            post = _update(using, post_id, changes, conditions)
+            if post is not None:
+                set_post_tags(post, tags)
+    if post is None:
+        raise _rejection(using, post_id, author_id, version)
+
+    bump_generation('posts', f'post:{post_id}')
+    return post
+
+
+def _update(using, post_id, changes, conditions):
+    connection = connections[using]
+    if _supports_returning(connection):
+        return _update_returning(connection, changes, conditions)
+    with transaction.atomic(using=using):
+        posts = Post.objects.using(using)
+        updated = posts.filter(**conditions).update(version=F('version') + 1, **changes)
+        return posts.only(*RETURNED_FIELDS).get(id=post_id) if updated else None
+
+
+def _update_returning(connection, changes, conditions):
+    quote = connection.ops.quote_name
+    table = quote(Post._meta.db_table)
+    assignments = [f'{quote(Post._meta.get_field(name).column)} = %s' for name in changes]
+    assignments.append(f"{quote('version')} = {quote('version')} + 1")
+    where = [f'{quote(Post._meta.get_field(name).column)} = %s' for name in conditions]
+    columns = ', '.join(quote(Post._meta.get_field(name).column) for name in RETURNED_FIELDS)
+    params = [
+        Post._meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in changes.items()
+    ] + list(conditions.values())
+    sql = f"UPDATE {table} SET {', '.join(assignments)} WHERE {' AND '.join(where)} RETURNING {columns}"
+    # raw() turns the returned columns into a Post with the usual field conversions
+    rows = list(Post.objects.raw(sql, params, using=connection.alias))
+    return rows[0] if rows else None
+
+
+def delete_post(post_id, author_id, version=None):
+    """
+    Delete a post owned by author_id: one statement for the post and one each
+    for its likes and tags, matched by the same conditions. Raises a
+    PostWriteError subclass.
+    """
+    conditions = {'id': post_id, 'author_id': author_id}
+    if version is not None:
+        conditions['version'] = version
+
+    using = router.db_for_write(Post)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    where = ' AND '.join(f'{quote(Post._meta.get_field(name).column)} = %s' for name in conditions)
+    params = list(conditions.values())
+    matched = f'SELECT id FROM {quote(Post._meta.db_table)} WHERE {where}'
+    post_tags = quote(PostTag._meta.db_table)
+    # Bare DELETEs, without the collector's SELECT of the rows and its signals.
+    # Likes and tags go first so the foreign keys hold without relying on deferred checks.
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(PostLike._meta.db_table)} WHERE post_id IN ({matched})', params)
+        if _supports_returning(connection):
+            cursor.execute(f'DELETE FROM {post_tags} WHERE post_id IN ({matched}) RETURNING tag_id', params)
+            tag_ids = [row[0] for row in cursor.fetchall()]
+        else:
+            cursor.execute(f'SELECT tag_id FROM {post_tags} WHERE post_id IN ({matched})', params)
+            tag_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'DELETE FROM {post_tags} WHERE post_id IN ({matched})', params)
+        cursor.execute(f'DELETE FROM {quote(Post._meta.db_table)} WHERE {where}', params)
+        if not cursor.rowcount:
+            # Inside the transaction, so the likes and tags deleted above are rolled back
+            raise _rejection(using, post_id, author_id, version)
+
+    post_count.incr(-1)
+    author_post_count(author_id).incr(-1)
+    for tag_id in tag_ids:
+        tag_post_count(tag_id).incr(-1)
+    bump_generation('posts', f'post:{post_id}')